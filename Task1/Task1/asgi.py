@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Task1.settings')
 
 application = get_asgi_application()
+
+# imported once Django is set up: it reads the settings
+from app1.admission import admission_controlled  # noqa: E402
+
+application = admission_controlled(application)
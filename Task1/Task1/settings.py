@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app1.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app1.db_router.ReplicaRoutingMiddleware',
     'app1.middleware.AuthMiddleware',
 ]
 
@@ -85,14 +87,59 @@ WSGI_APPLICATION = 'Task1.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': "mydb",
-        'USER': "postgres",
-        'PASSWORD': "postgres",
-        'HOST': "localhost",
-        'PORT': "5432",
+        'NAME': os.environ.get("DB_NAME", "mydb"),
+        'USER': os.environ.get("DB_USER", "postgres"),
+        'PASSWORD': os.environ.get("DB_PASSWORD", "postgres"),
+        'HOST': os.environ.get("DB_HOST", "localhost"),
+        'PORT': os.environ.get("DB_PORT", "5432"),
     }
 }
 
+# Connection pool (psycopg 3). Each server process keeps between
+# DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE connections open; a request borrows
+# one and returns it when it finishes, so requests skip the connection
+# handshake. The pool belongs to the process, which is what ASGI needs:
+# persistent per-thread connections (CONN_MAX_AGE) leak under ASGI.
+if os.environ.get("DB_POOL", "1") == "1":
+    DATABASES['default']['OPTIONS'] = {
+        "pool": {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            # seconds a request waits for a free connection before erroring
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            # idle connections above min_size are closed after this long
+            "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 600)),
+            # connections are recycled after this long
+            "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 3600)),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get("DB_CONN_MAX_AGE", 0))
+
+# With the pool: ping each connection as it is handed out (one extra round
+# trip) so one dropped by the server or a proxy is replaced rather than used.
+# Without it: check a persistent connection before reusing it.
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get("DB_HEALTH_CHECKS", "1") == "1"
+
+# Read replicas: DB_REPLICA_HOSTS="host1,host2:5433" adds the aliases
+# replica1, replica2, ... with the default database's name and credentials.
+# The list endpoints read from them (app1.db_router); a client that wrote is
+# kept on the primary for REPLICA_STICKY_SECONDS.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), 1):
+    host, _, port = replica.strip().partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # tests read the replicas' rows from the test default database
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ['app1.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -131,4 +178,180 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 
-TOKEN_EXPIRY_HOURS = 1
\ No newline at end of file
+# Login returns a short-lived access token (JWT) and a refresh token.
+# POST /api/token/refresh renews both without the password until the
+# session ends, REFRESH_TOKEN_EXPIRY_HOURS after login.
+ACCESS_TOKEN_EXPIRY_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRY_MINUTES", 15))
+REFRESH_TOKEN_EXPIRY_HOURS = int(os.environ.get("REFRESH_TOKEN_EXPIRY_HOURS", 24))
+
+# Session store used by app1.middleware.AuthMiddleware in front of UserLoginInfo.
+#   app1.session_store.LocalSessionStore    - per-process LRU/TTL cache
+#   app1.session_store.RedisSessionStore    - shared across replicas
+#   app1.session_store.DatabaseSessionStore - no cache, ORM on every request
+SESSION_STORE = {
+    "BACKEND": os.environ.get("SESSION_STORE_BACKEND", "app1.session_store.LocalSessionStore"),
+    "OPTIONS": {
+        "ttl_seconds": int(os.environ.get("SESSION_STORE_TTL_SECONDS", 300)),
+    },
+}
+
+if SESSION_STORE["BACKEND"] == "app1.session_store.RedisSessionStore":
+    SESSION_STORE["OPTIONS"]["location"] = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+elif SESSION_STORE["BACKEND"] == "app1.session_store.DatabaseSessionStore":
+    SESSION_STORE["OPTIONS"] = {}
+else:
+    SESSION_STORE["OPTIONS"]["max_entries"] = int(os.environ.get("SESSION_STORE_MAX_ENTRIES", 10000))
+
+
+# bcrypt work from CreateUser / UpdateUser / Login runs on a bounded thread pool
+# (api.hashing). Requests beyond workers + pending are answered with 503.
+BCRYPT_POOL_WORKERS = int(os.environ.get("BCRYPT_POOL_WORKERS", os.cpu_count() or 1))
+BCRYPT_POOL_MAX_PENDING = int(os.environ.get("BCRYPT_POOL_MAX_PENDING", 32))
+# Bulk user creation hashes on its own pool, a quarter of the size by
+# default; each batch takes one slot per worker, so pending = workers lets
+# one more batch wait.
+BCRYPT_BULK_POOL_WORKERS = int(os.environ.get("BCRYPT_BULK_POOL_WORKERS", max(1, BCRYPT_POOL_WORKERS // 4)))
+BCRYPT_BULK_POOL_MAX_PENDING = int(os.environ.get("BCRYPT_BULK_POOL_MAX_PENDING", BCRYPT_BULK_POOL_WORKERS))
+
+
+REST_FRAMEWORK = {
+    # app1.middleware.AuthMiddleware does the authentication; DRF only picks
+    # up its result (the session authenticator expects a django.contrib.auth user)
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "api.authentication.AuthMiddlewareAuthentication",
+    ],
+    # orjson-backed JSON (falls back to DRF's encoder when orjson is missing)
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For.
+    # 0 (the kubernetes NodePort and compose setups) keys the per-IP rate
+    # limits on REMOTE_ADDR; otherwise the header is client controlled.
+    "NUM_PROXIES": int(os.environ.get("API_NUM_PROXIES", 0)),
+}
+
+# Token-bucket rate limits (api.throttling) checked by login and create_user
+# before any hashing: "<requests>/<s|min|hour|day>" per client IP and per
+# user name. The bucket holds <requests> tokens, so that is also the burst.
+# API_RATE_LIMIT_ENABLED=0 turns them off.
+API_RATE_LIMITS = {
+    "login": {
+        "ip": os.environ.get("API_RATE_LIMIT_LOGIN_IP", "30/min"),
+        "user": os.environ.get("API_RATE_LIMIT_LOGIN_USER", "10/min"),
+    },
+    "create_user": {
+        "ip": os.environ.get("API_RATE_LIMIT_CREATE_USER_IP", "10/min"),
+    },
+} if os.environ.get("API_RATE_LIMIT_ENABLED", "1") == "1" else {}
+
+# User names starting with api.serializers.RESERVED_USER_NAME_PREFIX belong to
+# the load benchmarks' rows (api.benchmark), which are deleted by prefix. The
+# API refuses them unless this is on; the benchmarks turn it on in the
+# processes they measure, so their create_user requests stay in the prefix.
+API_ALLOW_RESERVED_USER_NAMES = os.environ.get("API_ALLOW_RESERVED_USER_NAMES", "0") == "1"
+
+#   api.throttling.LocalRateLimiter - per-process buckets
+#   api.throttling.RedisRateLimiter - shared across processes and replicas
+API_RATE_LIMIT = {
+    "BACKEND": os.environ.get("API_RATE_LIMIT_BACKEND", "api.throttling.LocalRateLimiter"),
+    "OPTIONS": {},
+}
+if API_RATE_LIMIT["BACKEND"] == "api.throttling.RedisRateLimiter":
+    API_RATE_LIMIT["OPTIONS"]["location"] = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Admission control in front of the ASGI app (app1.admission), per server
+# process: at most ADMISSION_MAX_IN_FLIGHT requests run at once, and each
+# class has its own gate. Requests wait in a bounded queue for up to
+# ADMISSION_QUEUE_TIMEOUT_SECONDS, then get 503 with Retry-After. With
+# target_p99_ms a class's limit shrinks while its p99 is above the target
+# and grows back (up to "limit") when it is not.
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 128))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 512))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", 2))
+ADMISSION_CLASSES = {
+    "read": {"limit": 64, "max_queue": 256, "target_p99_ms": 250},
+    # bcrypt: more in flight than the hashing pool can run only queues there
+    "write": {"limit": BCRYPT_POOL_WORKERS * 2, "max_queue": BCRYPT_POOL_MAX_PENDING, "target_p99_ms": 2000},
+    # ?format=ndjson streams hold a connection for the whole table
+    "export": {"limit": 2, "max_queue": 4},
+}
+# the "write" class; everything else is "read" unless it asks for NDJSON
+ADMISSION_WRITE_PATHS = ["/api/login", "/api/create_user", "/api/bulk_create_users", "/api/update_user_details/"]
+
+# Keyset pagination for the list endpoints (api.pagination)
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Rows fetched per server-side cursor round trip when streaming ?format=ndjson
+API_EXPORT_CHUNK_SIZE = 2000
+
+# Serve the reporting endpoints from materialized views (migration 0005)
+# instead of the plain SQL views. With a positive debounce, writes trigger a
+# concurrent refresh that many seconds later, one per window across every
+# process sharing the cache; with 0 run `manage.py refresh_reporting_views`
+# on a schedule instead.
+REPORTING_VIEWS_MATERIALIZED = os.environ.get("REPORTING_VIEWS_MATERIALIZED", "0") == "1"
+REPORTING_REFRESH_DEBOUNCE_SECONDS = float(os.environ.get("REPORTING_REFRESH_DEBOUNCE_SECONDS", 5))
+
+# Session retention (app1.retention): logins expired for longer than
+# SESSION_RETENTION_HOURS are deleted in batches by `manage.py purge_sessions`
+# and every SESSION_SWEEP_INTERVAL_SECONDS (0 disables it) by a sweeper
+# thread, which gunicorn.conf.py starts in each worker. Other servers run
+# `manage.py purge_sessions --forever` next to them instead.
+SESSION_RETENTION_HOURS = int(os.environ.get("SESSION_RETENTION_HOURS", 24 * 7))
+SESSION_PURGE_BATCH_SIZE = int(os.environ.get("SESSION_PURGE_BATCH_SIZE", 1000))
+SESSION_SWEEP_INTERVAL_SECONDS = int(os.environ.get("SESSION_SWEEP_INTERVAL_SECONDS", 900))
+# Months of partitions kept ready ahead once the table is partitioned
+# (`manage.py partition_sessions --convert`)
+SESSION_PARTITION_MONTHS_AHEAD = 3
+
+# Largest batch accepted by the bulk endpoints (api.bulk)
+API_BULK_MAX_ROWS = 5000
+
+# Serve the list endpoints with the async views (api.views.AsyncListView);
+# set API_ASYNC_VIEWS=0 for the thread-per-request sync views
+API_ASYNC_VIEWS = os.environ.get("API_ASYNC_VIEWS", "1") == "1"
+
+# Shared cache for the response cache and its data versions. Without
+# REDIS_URL each process has its own cache, and a write only invalidates the
+# copies in the process that handled it.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        },
+    }
+
+# Cache list responses under versioned keys with ETag / If-None-Match
+# (api.response_cache); writes bump the versions (app1.data_versions)
+API_RESPONSE_CACHE = os.environ.get("API_RESPONSE_CACHE", "1") == "1"
+API_RESPONSE_CACHE_ALIAS = "default"
+API_RESPONSE_CACHE_SECONDS = int(os.environ.get("API_RESPONSE_CACHE_SECONDS", 300))
+
+# Recently verified JWTs, memoized by digest so repeat requests skip the
+# signature check (app1.tokens)
+TOKEN_MEMO_MAX_ENTRIES = int(os.environ.get("TOKEN_MEMO_MAX_ENTRIES", 10000))
+TOKEN_MEMO_TTL_SECONDS = int(os.environ.get("TOKEN_MEMO_TTL_SECONDS", 300))
+
+# Request profiling (app1.middleware.InstrumentationMiddleware): Server-Timing
+# headers and Prometheus histograms for a sample of requests. Off by default;
+# when off the middleware is not loaded at all.
+INSTRUMENTATION_ENABLED = os.environ.get("INSTRUMENTATION_ENABLED", "0") == "1"
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", 1.0))
+INSTRUMENTATION_SERVER_TIMING = os.environ.get("INSTRUMENTATION_SERVER_TIMING", "1") == "1"
+INSTRUMENTATION_METRICS_PATH = os.environ.get("INSTRUMENTATION_METRICS_PATH", "/metrics")
+# Who may read the metrics: clients in INSTRUMENTATION_METRICS_ALLOWED_IPS
+# (addresses or networks, comma separated; loopback only by default) or
+# requests carrying "Authorization: Bearer <INSTRUMENTATION_METRICS_TOKEN>".
+# Anyone else gets the 404 of an unknown path. Behind the NodePort the
+# client address is rewritten, so give the scraper the token.
+INSTRUMENTATION_METRICS_ALLOWED_IPS = [
+    network.strip()
+    for network in filter(None, os.environ.get("INSTRUMENTATION_METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(","))
+]
+INSTRUMENTATION_METRICS_TOKEN = os.environ.get("INSTRUMENTATION_METRICS_TOKEN", "")
+# log a view that runs the same statement this many times in one request
+INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD = 5
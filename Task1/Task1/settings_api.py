@@ -0,0 +1,42 @@
+"""
+API-only profile for the serving pods: DJANGO_SETTINGS_MODULE=Task1.settings_api.
+
+The JSON API authenticates with its own JWTs (app1.middleware.AuthMiddleware)
+and renders JSON only, so admin, auth, contenttypes, sessions, messages,
+staticfiles, whitenoise, CSRF and the template engine are left out: fewer
+modules are imported and fewer middleware run on each request. The admin
+stays on the full profile (Task1.settings); run migrations and
+createsuperuser with that one too.
+"""
+
+from Task1.settings import *  # noqa: F401,F403
+from Task1.settings import REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'api',
+    'app1',
+]
+
+MIDDLEWARE = [
+    'app1.middleware.InstrumentationMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'app1.db_router.ReplicaRoutingMiddleware',
+    'app1.middleware.AuthMiddleware',
+]
+
+ROOT_URLCONF = 'Task1.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # no browsable API: it needs templates and static files
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+    ],
+    # anonymous requests get request.user = None instead of
+    # django.contrib.auth's AnonymousUser
+    "UNAUTHENTICATED_USER": None,
+}
@@ -0,0 +1,8 @@
+"""URL configuration of the API-only profile (Task1.settings_api): no admin."""
+from django.urls import path,include
+from django.http import HttpResponse
+
+urlpatterns = [
+    path('', lambda r: HttpResponse("Server running 🚀")),
+    path('api/', include('api.urls'))
+]
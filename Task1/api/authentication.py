@@ -0,0 +1,16 @@
+from rest_framework.authentication import BaseAuthentication
+
+
+class AuthMiddlewareAuthentication(BaseAuthentication):
+    """
+    Hands DRF what AuthMiddleware already verified: ``request.user`` is the
+    session's SessionUser and ``request.auth`` the token claims. No parsing
+    or queries happen here; requests the middleware did not authenticate are
+    anonymous.
+    """
+
+    def authenticate(self, request):
+        claims = getattr(request._request, "auth_claims", None)
+        if claims is None:
+            return None
+        return request._request.user, claims
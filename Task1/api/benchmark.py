@@ -0,0 +1,584 @@
+"""Helpers for the load benchmarks (bench_api, bench_async, bench_db_pool, bench_workers)."""
+import asyncio
+import contextlib
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import bcrypt
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from app1.data_versions import ALL_SCOPES, bump
+from app1.models import TeamInfo, TeamUsers, UserInfo, UserLoginInfo
+from app1.reporting import refresh_materialized_views
+from api.serializers import RESERVED_USER_NAME_PREFIX
+
+# seeded rows are named after this prefix and replaced by the next seed; the
+# API rejects user names with it, so the replacement never deletes real users
+SEED_PREFIX = RESERVED_USER_NAME_PREFIX + "load"
+
+# --session-store choices of the stack comparisons
+SESSION_STORES = {
+    "local": "app1.session_store.LocalSessionStore",
+    "redis": "app1.session_store.RedisSessionStore",
+    "database": "app1.session_store.DatabaseSessionStore",
+}
+
+# What bench_api replays without --mix / --paths. ``{me}`` / ``{password}``
+# are the benchmark user, ``{user}`` / ``{team}`` a seeded user / team,
+# ``{prefix}`` is SEED_PREFIX and ``{n}`` is unique per request.
+DEFAULT_MIX = [
+    {"name": "get_users", "path": "/api/get_users?limit=50", "weight": 4},
+    {"name": "get_all_user_details", "path": "/api/get_all_user_details?limit=50", "weight": 2},
+    {"name": "get_teams", "path": "/api/get_teams?limit=50", "weight": 2},
+    {"name": "login", "method": "POST", "path": "/api/login", "auth": False,
+     "body": {"user_name": "{me}", "user_password": "{password}"}},
+    {"name": "create_user", "method": "POST", "path": "/api/create_user", "auth": False,
+     "body": {"user_name": "{prefix}new{n}", "user_email": "{prefix}new{n}@example.com",
+              "user_password": "{password}", "user_role": 3, "user_fullname": "Benchmark"}},
+]
+
+# Environment of the processes serving or measuring a replayed mix. The whole
+# load comes from one client, so the rate limits are off, and the mix may
+# create users under SEED_PREFIX so the next seed() deletes them.
+MIX_ENV = {"API_RATE_LIMIT_ENABLED": "0", "API_ALLOW_RESERVED_USER_NAMES": "1"}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client (Content-Length bodies only)."""
+
+    def __init__(self, port, token=None):
+        self.port = port
+        self.token = token
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def request(self, method, path, body=b"", auth=True):
+        headers = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+        if body:
+            headers.append("Content-Type: application/json")
+        if auth and self.token:
+            headers.append(f"Authorization: {self.token}")
+        self.writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+
+class ASGIConnection:
+    """
+    Same interface as HTTPConnection, but calls the ASGI application in this
+    process: no sockets or server, and the queries can be counted.
+    """
+
+    def __init__(self, application, token=None):
+        self.application = application
+        self.token = token
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def request(self, method, path, body=b"", auth=True):
+        url = urlsplit(path)
+        headers = [(b"host", b"localhost"), (b"content-length", str(len(body)).encode())]
+        if body:
+            headers.append((b"content-type", b"application/json"))
+        if auth and self.token:
+            headers.append((b"authorization", self.token.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+
+        received = False
+        finished = asyncio.Event()
+        status = None
+        chunks = []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Django listens for a disconnect while the view runs
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.application(scope, receive, send)
+        finished.set()
+        return status, b"".join(chunks)
+
+
+# per-request query counter read by the execute wrapper below; the ORM
+# threads of sync_to_async see the value of the request that called them
+_queries = ContextVar("benchmark_queries", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _add_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextlib.contextmanager
+def counting_queries():
+    """Count queries per request for connections opened inside the block."""
+    connection_created.connect(_add_query_counter)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(_add_query_counter)
+
+
+def ensure_user(username, password, rounds=4):
+    if not UserInfo.objects.filter(user_name=username).exists():
+        UserInfo.objects.create(
+            user_name=username,
+            user_email=f"{username}@example.com",
+            user_password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode(),
+            user_role=3,
+            user_fullname="Benchmark",
+        )
+
+
+def start_server(port, env=None, gunicorn=False):
+    """
+    uvicorn serving Task1.asgi on ``port`` with ``env`` added to the
+    environment, or gunicorn with gunicorn.conf.py (its workers from
+    WEB_CONCURRENCY in ``env``).
+    """
+    if gunicorn:
+        command = [sys.executable, "-m", "gunicorn", "Task1.asgi:application",
+                   "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "Task1.asgi:application",
+                   "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env={**os.environ, **(env or {})})
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.terminate()
+    raise BenchmarkError("uvicorn did not start")
+
+
+def seed(users, logins_per_user=2, teams=0, members_per_team=5, password="bench-password", rounds=12):
+    """
+    Replace the previously seeded rows with ``users`` users, each with
+    ``logins_per_user`` sessions (half of them expired), and ``teams`` teams
+    of ``members_per_team`` members. Returns the number of rows per model.
+    """
+    UserInfo.objects.filter(user_name__startswith=SEED_PREFIX).delete()
+
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+    created = UserInfo.objects.bulk_create(
+        [
+            UserInfo(
+                user_name=f"{SEED_PREFIX}{i}",
+                user_email=f"{SEED_PREFIX}{i}@example.com",
+                user_password=hashed,
+                user_role=3,
+                user_fullname=f"Load {i}",
+            )
+            for i in range(users)
+        ],
+        batch_size=1000,
+    )
+
+    now = timezone.now()
+    expiry = timedelta(hours=settings.REFRESH_TOKEN_EXPIRY_HOURS)
+    UserLoginInfo.objects.bulk_create(
+        (
+            UserLoginInfo(
+                user=user,
+                login_session_id=secrets.token_hex(32),
+                token_digest=secrets.token_hex(32),
+                is_active=n % 2 == 0,
+                expires_at=now + expiry if n % 2 == 0 else now - expiry,
+            )
+            for user in created
+            for n in range(logins_per_user)
+        ),
+        batch_size=1000,
+    )
+
+    team_rows = TeamInfo.objects.bulk_create(
+        [
+            TeamInfo(
+                user=created[i % len(created)],
+                team_id=f"{SEED_PREFIX[0].upper()}{i}",
+                team_name=f"{SEED_PREFIX}-team{i}",
+                team_created_by=created[i % len(created)].user_name[:10],
+            )
+            for i in range(teams if created else 0)
+        ],
+        batch_size=1000,
+    )
+    TeamUsers.objects.bulk_create(
+        (
+            TeamUsers(user=created[(t * members_per_team + m) % len(created)], team=team,
+                      team_user_team_role=m % 3 + 1)
+            for t, team in enumerate(team_rows)
+            for m in range(min(members_per_team, len(created)))
+        ),
+        batch_size=1000,
+    )
+
+    # bulk_create sends no signals: refresh what the write signals would have
+    refresh_materialized_views(concurrently=False)
+    bump(*ALL_SCOPES)
+    return {
+        "UserInfo": len(created),
+        "UserLoginInfo": len(created) * logins_per_user,
+        "TeamInfo": len(team_rows),
+        "TeamUsers": len(team_rows) * min(members_per_team, len(created)),
+    }
+
+
+def load_mix(path):
+    """
+    Read a request mix: one JSON object per line with ``path`` and optionally
+    ``name``, ``method`` (GET), ``body``, ``auth`` (true) and ``weight`` (1).
+    """
+    mix = []
+    with open(path) as lines:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as exc:
+                raise BenchmarkError(f"{path}:{number}: {exc}")
+            if not isinstance(entry, dict) or "path" not in entry:
+                raise BenchmarkError(f"{path}:{number}: expected an object with a path")
+            mix.append(entry)
+    if not mix:
+        raise BenchmarkError(f"{path}: no requests")
+    return mix
+
+
+def paths_mix(paths):
+    return [{"path": path} for path in paths]
+
+
+def _name(entry):
+    method = entry.get("method", "GET").upper()
+    return entry.get("name") or f"{method} {urlsplit(entry['path']).path}"
+
+
+def _render(text, values):
+    for key, value in values.items():
+        text = text.replace("{%s}" % key, str(value))
+    return text
+
+
+async def login_with(conn, username, password):
+    body = json.dumps({"user_name": username, "user_password": password}).encode()
+    status, response = await conn.request("POST", "/api/login", body=body, auth=False)
+    if status != 200:
+        raise BenchmarkError(f"login failed: {status} {response[:200]!r}")
+    return json.loads(response)["data"]["token"]
+
+
+async def login(port, username, password):
+    conn = HTTPConnection(port)
+    await conn.connect()
+    try:
+        return await login_with(conn, username, password)
+    finally:
+        await conn.close()
+
+
+async def run_load(port, token, paths, requests, concurrency):
+    """
+    Send ``requests`` GETs over ``concurrency`` keep-alive connections,
+    cycling through ``paths``. Returns req/s, p50/p99 in ms and the number
+    of non-200 responses.
+    """
+    # warm up every path once before measuring
+    warm = HTTPConnection(port, token)
+    await warm.connect()
+    for path in paths:
+        await warm.request("GET", path)
+    await warm.close()
+
+    counter = iter(range(requests))
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        conn = HTTPConnection(port, token)
+        await conn.connect()
+        for i in counter:
+            start = time.perf_counter()
+            status, _ = await conn.request("GET", paths[i % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+        await conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+    }
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_mix(connect, mix, requests, concurrency, values, shuffle_seed=0):
+    """
+    Replay ``mix`` (weighted, in a shuffled but repeatable order) for
+    ``requests`` requests over ``concurrency`` connections made by
+    ``connect()``. Returns ``{"endpoints": {name: stats}, "total": stats}``;
+    the query counts are only filled in where counting_queries() sees them.
+    """
+    schedule = [entry for entry in mix for _ in range(int(entry.get("weight", 1)))]
+    if not schedule:
+        raise BenchmarkError("the mix has no requests with a positive weight")
+    random.Random(shuffle_seed).shuffle(schedule)
+    run = secrets.token_hex(2)
+    users = values.pop("users", None) or [values["me"]]
+    teams = values.pop("teams", None) or [""]
+
+    def prepare(entry, i):
+        current = {**values, "prefix": SEED_PREFIX, "n": f"{run}{i}", "user": users[i % len(users)],
+                   "team": teams[i % len(teams)]}
+        body = entry.get("body")
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        body = _render(body, current).encode() if body is not None else b""
+        return entry.get("method", "GET").upper(), _render(entry["path"], current), body, entry.get("auth", True)
+
+    samples = {_name(entry): [] for entry in mix}
+
+    # warm up every request once before measuring
+    warm = connect()
+    await warm.connect()
+    for i, entry in enumerate(mix):
+        await warm.request(*prepare(entry, requests + i))
+    await warm.close()
+
+    counter = iter(range(requests))
+
+    async def client():
+        conn = connect()
+        await conn.connect()
+        for i in counter:
+            entry = schedule[i % len(schedule)]
+            request = prepare(entry, i)
+            queries = [0]
+            token = _queries.set(queries)
+            start = time.perf_counter()
+            try:
+                status, _ = await conn.request(*request)
+            finally:
+                _queries.reset(token)
+            samples[_name(entry)].append((time.perf_counter() - start, status, queries[0]))
+        await conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    endpoints = {name: _stats(rows, elapsed) for name, rows in samples.items() if rows}
+    return {"endpoints": endpoints, "total": _stats([row for rows in samples.values() for row in rows], elapsed)}
+
+
+def _stats(samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    return {
+        "requests": len(samples),
+        "rps": len(samples) / elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "errors": sum(1 for _, status, _ in samples if status >= 400),
+        "queries": sum(queries for _, _, queries in samples) / len(samples),
+    }
+
+
+def compare_results(baseline, current):
+    """``(name, rps change %, p99 change %)`` per endpoint present in both runs."""
+    rows = []
+    for name, stats in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None or not before["rps"] or not before["p99"]:
+            continue
+        rows.append((
+            name,
+            (stats["rps"] / before["rps"] - 1) * 100,
+            (stats["p99"] / before["p99"] - 1) * 100,
+        ))
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stack_env(options):
+    """
+    Environment shared by every stack of a comparison. The response cache is
+    off unless --response-cache, so the load reaches the views and the
+    database instead of replaying cached pages.
+    """
+    return {
+        "API_RESPONSE_CACHE": "1" if options["response_cache"] else "0",
+        "SESSION_STORE_BACKEND": SESSION_STORES[options["session_store"]],
+    }
+
+
+def compare_stacks(stacks, options, paths, write, gunicorn=False):
+    """
+    Serve each ``(name, env)`` stack in turn, on top of ``stack_env``, and
+    load it; writes one line per stack and returns ``{name: stats}``.
+    """
+    ensure_user(options["user"], options["password"])
+    shared = stack_env(options)
+    write(
+        f"response cache {'on' if options['response_cache'] else 'off'}, "
+        f"session store {options['session_store']}"
+    )
+
+    async def measure():
+        token = await login(options["port"], options["user"], options["password"])
+        return await run_load(options["port"], token, paths, options["requests"], options["concurrency"])
+
+    results = {}
+    for name, env in stacks:
+        server = start_server(options["port"], {**shared, **env}, gunicorn)
+        try:
+            results[name] = stats = asyncio.run(measure())
+        finally:
+            server.terminate()
+            server.wait()
+        write(
+            f"{name:<8} {stats['rps']:>9,.0f} req/s   p50 {stats['p50']:>7.1f} ms   "
+            f"p99 {stats['p99']:>7.1f} ms   errors {stats['errors']}"
+        )
+    return results
+
+
+def add_load_arguments(parser, paths):
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per stack.")
+    parser.add_argument("--concurrency", type=int, default=64, help="Open keep-alive connections.")
+    parser.add_argument("--paths", default=paths, help="Comma separated paths, requested round robin.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--user", default="bench")
+    parser.add_argument("--password", default="bench-password")
+
+
+def add_stack_arguments(parser, session_store="local"):
+    """Options of ``stack_env``, for the commands built on ``compare_stacks``."""
+    parser.add_argument("--session-store", choices=sorted(SESSION_STORES), default=session_store,
+                        help="Session store of the served stacks (SESSION_STORE_BACKEND).")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Leave the response cache on; by default the stacks run with API_RESPONSE_CACHE=0.")
+
+
+class MixEnvCommand:
+    """
+    Mixin for commands that replay requests in their own process. Settings
+    are read at startup, so unless the process already runs with MIX_ENV's
+    settings, ``rerun_with_mix_env`` runs the same command line again in a
+    child process with MIX_ENV added to the environment.
+    """
+
+    def run_from_argv(self, argv):
+        self.argv = argv[1:]
+        super().run_from_argv(argv)
+
+    def rerun_with_mix_env(self):
+        """True once the child has run; False when this process can measure itself."""
+        if not settings.API_RATE_LIMITS and settings.API_ALLOW_RESERVED_USER_NAMES:
+            return False
+        argv = getattr(self, "argv", None)
+        if argv is None:
+            raise BenchmarkError(
+                "run with " + " ".join(f"{name}={value}" for name, value in MIX_ENV.items())
+            )
+        child = subprocess.run([sys.executable, "manage.py", *argv], cwd=settings.BASE_DIR,
+                               env={**os.environ, **MIX_ENV})
+        if child.returncode:
+            raise BenchmarkError(f"{argv[0]} exited with status {child.returncode}")
+        return True
+
+
+def split_paths(raw):
+    return [p.strip() for p in raw.split(",") if p.strip()]
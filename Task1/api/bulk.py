@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from app1.models import UserInfo, TeamUsers
+from api.serializers import TeamMemberSerializer, UserInfoBulkSerializer
+
+
+class BulkError(ValueError):
+    """The request body is not a usable batch."""
+
+
+def batch_rows(data, key):
+    """
+    The list of rows in a bulk request body: either the list itself or the
+    list under ``key``.
+    """
+    rows = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        raise BulkError(f"Expected a non-empty list of {key}")
+    if len(rows) > settings.API_BULK_MAX_ROWS:
+        raise BulkError(f"At most {settings.API_BULK_MAX_ROWS} {key} per request")
+    return rows
+
+
+def invalid(index, errors):
+    return {"index": index, "status": "invalid", "errors": errors}
+
+
+def validate_users(rows):
+    """
+    Validate a batch of new users.
+
+    Returns ``(results, valid)``: ``results`` has one entry per row, None for
+    rows that passed, and ``valid`` holds ``(index, validated_data)`` for
+    those. Field checks run per row without queries; ``user_name`` and
+    ``user_email`` uniqueness is checked against the table in one query and
+    against the rest of the batch.
+    """
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = UserInfoBulkSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = invalid(index, serializer.errors)
+
+    names = {data["user_name"] for _, data in valid}
+    emails = {data["user_email"] for _, data in valid}
+
+    taken_names, taken_emails = set(), set()
+    existing = UserInfo.objects.filter(Q(user_name__in=names) | Q(user_email__in=emails))
+    for name, email in existing.values_list("user_name", "user_email"):
+        taken_names.add(name)
+        taken_emails.add(email)
+
+    # the first row with a given name / email wins within the batch
+    seen_names, seen_emails = set(), set()
+    passed = []
+    for index, data in valid:
+        errors = {}
+        if data["user_name"] in taken_names:
+            errors["user_name"] = ["user info with this user name already exists."]
+        elif data["user_name"] in seen_names:
+            errors["user_name"] = ["Duplicate user_name in this batch."]
+        if data["user_email"] in taken_emails:
+            errors["user_email"] = ["user info with this user email already exists."]
+        elif data["user_email"] in seen_emails:
+            errors["user_email"] = ["Duplicate user_email in this batch."]
+
+        if errors:
+            results[index] = invalid(index, errors)
+        else:
+            seen_names.add(data["user_name"])
+            seen_emails.add(data["user_email"])
+            passed.append((index, data))
+
+    return results, passed
+
+
+def create_users(valid, hashed):
+    """Insert the validated users with their password hashes, in one transaction."""
+    users = [
+        UserInfo(**{**data, "user_password": password})
+        for (_, data), password in zip(valid, hashed)
+    ]
+    with transaction.atomic():
+        UserInfo.objects.bulk_create(users, batch_size=1000)
+    return users
+
+
+def validate_members(team, rows):
+    """
+    Validate a batch of memberships of ``team``; same ``(results, valid)``
+    shape as validate_users. The referenced users and their existing
+    memberships of the team are each loaded in one query.
+    """
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = TeamMemberSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = invalid(index, serializer.errors)
+
+    user_ids = {data["user"] for _, data in valid}
+    users = set(UserInfo.objects.filter(user_id__in=user_ids, user_deleted=0).values_list("user_id", flat=True))
+    # active memberships only: a removed member may join again (teamusers_unique_member)
+    members = set(
+        TeamUsers.objects.filter(team=team, user_id__in=users, team_user_deleted=0).values_list("user_id", flat=True)
+    )
+
+    passed = []
+    for index, data in valid:
+        user_id = data["user"]
+        if user_id not in users:
+            results[index] = invalid(index, {"user": [f'Invalid pk "{user_id}" - object does not exist.']})
+        elif user_id in members:
+            results[index] = invalid(index, {"user": ["User is already a member of this team."]})
+        else:
+            # later rows for the same user count as duplicates
+            members.add(user_id)
+            passed.append((index, data))
+
+    return results, passed
+
+
+def create_members(team, valid):
+    """
+    Insert the validated memberships in one transaction; IntegrityError if
+    a concurrent request registered one of them since validation.
+    """
+    memberships = [
+        TeamUsers(team=team, user_id=data["user"], team_user_team_role=data["team_user_team_role"])
+        for _, data in valid
+    ]
+    with transaction.atomic():
+        TeamUsers.objects.bulk_create(memberships, batch_size=1000)
+    return memberships
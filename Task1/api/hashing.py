@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+from app1 import instrumentation
+
+
+class HashingPoolFull(Exception):
+    """The bcrypt pool already holds as many jobs as it is allowed to queue."""
+
+
+class HashingPool:
+    """
+    Bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL while hashing, so threads use every core without
+    the pickling cost of a process pool. At most ``max_workers`` hashes run at
+    once and at most ``max_pending`` more wait; anything beyond that is
+    rejected straight away with HashingPoolFull so callers can shed load
+    instead of queueing behind a burst.
+    """
+
+    def __init__(self, max_workers, max_pending, name="bcrypt"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def _reserve(self, count=1):
+        """Take ``count`` slots at once, or none of them and raise HashingPoolFull."""
+        taken = 0
+        while taken < count and self._slots.acquire(blocking=False):
+            taken += 1
+        if taken < count:
+            for _ in range(taken):
+                self._slots.release()
+            raise HashingPoolFull()
+
+    def _submit(self, func, *args):
+        # on a reserved slot, which is given back once the job is done or cancelled
+        metrics = instrumentation.current()
+        if metrics is not None:
+            future = self._executor.submit(instrumentation.timed_call, metrics, "bcrypt", func, *args)
+        else:
+            future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    async def run(self, func, *args):
+        self._reserve()
+        return await asyncio.wrap_future(self._submit(func, *args))
+
+    async def hashpw(self, password):
+        return await self.run(_hashpw, password)
+
+    async def checkpw(self, password, hashed):
+        return await self.run(bcrypt.checkpw, password, hashed)
+
+    async def hashpw_many(self, passwords):
+        """
+        Hash a whole batch, split into at most ``max_workers`` jobs so it
+        takes one pool slot per job rather than one per password. The slots
+        are reserved together, so a batch is shed whole or runs whole; when
+        one job fails, or the caller goes away, the jobs not yet started are
+        cancelled and give their slots back.
+        """
+        jobs = min(self.max_workers, len(passwords))
+        if not jobs:
+            return []
+        self._reserve(jobs)
+        futures = [self._submit(_hashpw_all, passwords[i::jobs]) for i in range(jobs)]
+        try:
+            hashed = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        finally:
+            for future in futures:
+                future.cancel()
+
+        result = [None] * len(passwords)
+        for i, chunk in enumerate(hashed):
+            result[i::jobs] = chunk
+        return result
+
+
+def _hashpw(password):
+    return bcrypt.hashpw(password, bcrypt.gensalt())
+
+
+def _hashpw_all(passwords):
+    return [_hashpw(password) for password in passwords]
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _get_pool(name, max_workers, max_pending):
+    # created on first use so that forked workers each build their own threads
+    pool = _pools.get(name)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = HashingPool(max_workers, max_pending, name=name)
+    return pool
+
+
+def get_hashing_pool():
+    """Pool for the interactive endpoints: login, create_user, update_user."""
+    return _get_pool("bcrypt", settings.BCRYPT_POOL_WORKERS, settings.BCRYPT_POOL_MAX_PENDING)
+
+
+def get_bulk_hashing_pool():
+    """
+    Separate, smaller pool for the bulk endpoints: a batch of thousands of
+    hashes runs on its threads only, and never queues logins behind it.
+    """
+    return _get_pool("bcrypt-bulk", settings.BCRYPT_BULK_POOL_WORKERS, settings.BCRYPT_BULK_POOL_MAX_PENDING)
@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app1.models import TeamInfo, UserInfo
+from api.benchmark import (
+    DEFAULT_MIX, MIX_ENV, SEED_PREFIX, ASGIConnection, BenchmarkError, HTTPConnection, MixEnvCommand,
+    add_load_arguments, compare_results, counting_queries, ensure_user, git_revision, load_mix, login,
+    login_with, paths_mix, run_mix, seed, split_paths, start_server,
+)
+
+# requests replayed in-process to count the queries of a uvicorn run
+PROBE_REQUESTS = 200
+
+
+class Command(MixEnvCommand, BaseCommand):
+    help = (
+        "Seed data, replay a request mix against the API (in-process ASGI or uvicorn) and report "
+        "req/s, p50/p95/p99 and queries per request per endpoint. Rate limits are off, since "
+        "the whole load comes from one client; users it creates are named under the seed prefix."
+    )
+
+    def add_arguments(self, parser):
+        add_load_arguments(parser, "")
+        parser.add_argument("--mix", help="JSONL request mix (see api.benchmark.load_mix); default: built-in mix.")
+        parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi",
+                            help="Call Task1.asgi in this process, or over HTTP through a uvicorn process.")
+        parser.add_argument("--seed-users", type=int, default=0,
+                            help="Replace the seeded rows with this many users first (0: keep the data).")
+        parser.add_argument("--logins-per-user", type=int, default=2)
+        parser.add_argument("--teams", type=int, default=0)
+        parser.add_argument("--members-per-team", type=int, default=5)
+        parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Cost of the seeded password hashes.")
+        parser.add_argument("--shuffle-seed", type=int, default=0, help="Order of the weighted mix.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--compare", help="JSON results of an earlier run to compare with.")
+        parser.add_argument("--max-regression", type=float,
+                            help="With --compare, fail when an endpoint's p99 grew by more than this many percent.")
+
+    def handle(self, *args, **options):
+        try:
+            if self.rerun_with_mix_env():
+                return
+            if options["mix"]:
+                mix = load_mix(options["mix"])
+            elif options["paths"]:
+                mix = paths_mix(split_paths(options["paths"]))
+            else:
+                mix = DEFAULT_MIX
+
+            if options["seed_users"]:
+                counts = seed(
+                    options["seed_users"], options["logins_per_user"], options["teams"],
+                    options["members_per_team"], options["password"], options["bcrypt_rounds"],
+                )
+                self.stdout.write("seeded " + ", ".join(f"{n:,} {model}" for model, n in counts.items()))
+            ensure_user(options["user"], options["password"])
+
+            results = self.measure(mix, options)
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        self.report(results)
+
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                json.dump(results, out, indent=2)
+            self.stdout.write(f"results written to {options['output']}")
+
+        if options["compare"]:
+            self.compare(options["compare"], results, options["max_regression"])
+
+    def measure(self, mix, options):
+        values = {
+            "me": options["user"],
+            "password": options["password"],
+            "users": list(
+                UserInfo.objects.filter(user_name__startswith=SEED_PREFIX).values_list("user_name", flat=True)[:1000]
+            ),
+            "teams": list(TeamInfo.objects.filter(team_deleted=0).values_list("team_name", flat=True)[:1000]),
+        }
+        load = (mix, options["requests"], options["concurrency"], values, options["shuffle_seed"])
+
+        if options["transport"] == "asgi":
+            results = asyncio.run(self.in_process(*load))
+        else:
+            port = options["port"]
+            server = start_server(port, MIX_ENV)
+            try:
+                token = asyncio.run(login(port, options["user"], options["password"]))
+                results = asyncio.run(run_mix(lambda: HTTPConnection(port, token), *load))
+            finally:
+                server.terminate()
+                server.wait()
+            # the server's queries are not visible here: replay part of the mix in-process to count them
+            probe = asyncio.run(self.in_process(
+                mix, min(options["requests"], PROBE_REQUESTS), 1, {**values}, options["shuffle_seed"],
+            ))
+            for name, stats in results["endpoints"].items():
+                stats["queries"] = probe["endpoints"].get(name, {}).get("queries")
+            results["total"]["queries"] = probe["total"]["queries"]
+
+        return {
+            "revision": git_revision(),
+            "date": timezone.now().isoformat(),
+            "transport": options["transport"],
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            **results,
+        }
+
+    async def in_process(self, mix, requests, concurrency, values, shuffle_seed):
+        from Task1.asgi import application
+
+        token = await login_with(ASGIConnection(application), values["me"], values["password"])
+        with counting_queries():
+            return await run_mix(lambda: ASGIConnection(application, token), mix, requests, concurrency,
+                                 values, shuffle_seed)
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<28} {'requests':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'errors':>7}"
+        )
+        for name, stats in [*results["endpoints"].items(), ("total", results["total"])]:
+            queries = "-" if stats["queries"] is None else f"{stats['queries']:.1f}"
+            self.stdout.write(
+                f"{name:<28} {stats['requests']:>8,} {stats['rps']:>9,.0f} {stats['p50']:>8.1f} "
+                f"{stats['p95']:>8.1f} {stats['p99']:>8.1f} {queries:>8} {stats['errors']:>7,}"
+            )
+
+    def compare(self, path, results, max_regression):
+        try:
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"cannot read {path}: {exc}")
+
+        self.stdout.write(f"vs {baseline.get('revision') or path}:")
+        regressed = []
+        for name, rps_change, p99_change in compare_results(baseline, results):
+            self.stdout.write(f"{name:<28} req/s {rps_change:>+7.1f}%   p99 {p99_change:>+7.1f}%")
+            if max_regression is not None and p99_change > max_regression:
+                regressed.append(name)
+
+        if regressed:
+            raise CommandError(f"p99 regressed by more than {max_regression}%: {', '.join(regressed)}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import BenchmarkError, add_load_arguments, add_stack_arguments, compare_stacks, split_paths
+
+DEFAULT_PATHS = "/api/get_users?limit=50,/api/get_all_user_details?limit=50,/api/get_teams?limit=50"
+
+
+class Command(BaseCommand):
+    help = (
+        "req/s and latency of the list endpoints with the sync views vs the async views "
+        "(API_ASYNC_VIEWS), each served by its own uvicorn process."
+    )
+
+    def add_arguments(self, parser):
+        add_load_arguments(parser, DEFAULT_PATHS)
+        add_stack_arguments(parser)
+
+    def handle(self, *args, **options):
+        stacks = [("sync", {"API_ASYNC_VIEWS": "0"}), ("async", {"API_ASYNC_VIEWS": "1"})]
+        try:
+            results = compare_stacks(stacks, options, split_paths(options["paths"]), self.stdout.write)
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"async vs sync: {results['async']['rps'] / results['sync']['rps']:.2f}x req/s, "
+            f"p99 {results['async']['p99']:.1f} ms vs {results['sync']['p99']:.1f} ms"
+        )
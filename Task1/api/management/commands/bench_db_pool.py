@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import BenchmarkError, add_load_arguments, add_stack_arguments, compare_stacks, split_paths
+
+DEFAULT_PATHS = "/api/get_users?limit=10"
+
+
+class Command(BaseCommand):
+    help = (
+        "req/s and latency with a new Postgres connection per request (DB_POOL=0, "
+        "CONN_MAX_AGE=0) vs the psycopg connection pool (DB_POOL=1). Sessions are read from the "
+        "database on every request unless --session-store says otherwise."
+    )
+
+    def add_arguments(self, parser):
+        add_load_arguments(parser, DEFAULT_PATHS)
+        add_stack_arguments(parser, session_store="database")
+
+    def handle(self, *args, **options):
+        stacks = [
+            ("no pool", {"DB_POOL": "0", "DB_CONN_MAX_AGE": "0"}),
+            ("pool", {"DB_POOL": "1"}),
+        ]
+        try:
+            results = compare_stacks(stacks, options, split_paths(options["paths"]), self.stdout.write)
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"pool vs no pool: p50 {results['pool']['p50']:.1f} ms vs {results['no pool']['p50']:.1f} ms, "
+            f"{results['pool']['rps'] / results['no pool']['rps']:.2f}x req/s"
+        )
@@ -0,0 +1,101 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per profile and run: time to a loaded ASGI
+# app, the first request (URLconf, DRF) and then the per-request cost of
+# two database-free requests: a token rejected by AuthMiddleware and a
+# malformed refresh token rejected by its DRF view.
+CHILD = r"""
+import asyncio, json, resource, sys, time
+
+start = time.perf_counter()
+from Task1.asgi import application
+startup = time.perf_counter() - start
+
+from api.benchmark import ASGIConnection
+
+async def measure(iterations):
+    conn = ASGIConnection(application)
+    requests = {
+        "middleware": ("GET", "/api/get_users", b""),
+        "view": ("POST", "/api/token/refresh", b'{"refresh_token": "x"}'),
+    }
+    first = time.perf_counter()
+    await conn.request(*requests["view"], auth=False)
+    first = time.perf_counter() - first
+
+    per_request = {}
+    for name, request in requests.items():
+        began = time.perf_counter()
+        for _ in range(iterations):
+            await conn.request(*request, auth=False)
+        per_request[name] = (time.perf_counter() - began) / iterations
+    return first, per_request
+
+first, per_request = asyncio.run(measure(int(sys.argv[1])))
+print(json.dumps({
+    "startup": startup,
+    "first_request": first,
+    "per_request": per_request,
+    "modules": len(sys.modules),
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Cold start (app import, first request, memory) and per-request overhead of the full "
+        "settings profile vs the API-only one, each measured in fresh processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default="Task1.settings,Task1.settings_api",
+                            help="Comma separated settings modules; the first is the baseline.")
+        parser.add_argument("--runs", type=int, default=5, help="Fresh processes per profile.")
+        parser.add_argument("--iterations", type=int, default=2000, help="Requests per path and process.")
+
+    def handle(self, *args, **options):
+        profiles = [p.strip() for p in options["profiles"].split(",") if p.strip()]
+        results = {}
+        for profile in profiles:
+            runs = [self.run(profile, options["iterations"]) for _ in range(options["runs"])]
+            results[profile] = stats = {
+                "startup": statistics.median(r["startup"] for r in runs) * 1000,
+                "first_request": statistics.median(r["first_request"] for r in runs) * 1000,
+                "middleware": statistics.median(r["per_request"]["middleware"] for r in runs) * 1e6,
+                "view": statistics.median(r["per_request"]["view"] for r in runs) * 1e6,
+                "modules": runs[0]["modules"],
+                "rss": statistics.median(r["max_rss_kb"] for r in runs) / 1024,
+            }
+            self.stdout.write(
+                f"{profile:<22} startup {stats['startup']:>7.1f} ms   first request {stats['first_request']:>6.1f} ms   "
+                f"{stats['modules']:>5} modules   {stats['rss']:>6.1f} MB   "
+                f"middleware {stats['middleware']:>6.1f} us   view {stats['view']:>6.1f} us"
+            )
+
+        base = results[profiles[0]]
+        for profile in profiles[1:]:
+            stats = results[profile]
+            self.stdout.write(
+                f"{profile} vs {profiles[0]}: startup {stats['startup'] / base['startup']:.2f}x, "
+                f"per request {stats['view'] / base['view']:.2f}x (view), "
+                f"{stats['middleware'] / base['middleware']:.2f}x (middleware only)"
+            )
+
+    def run(self, profile, iterations):
+        child = subprocess.run(
+            [sys.executable, "-c", CHILD, str(iterations)],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            # no instrumentation in the measured processes
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": profile, "INSTRUMENTATION_ENABLED": "0"},
+        )
+        if child.returncode != 0:
+            raise CommandError(f"{profile}: {child.stderr.strip()[-500:]}")
+        return json.loads(child.stdout.strip().splitlines()[-1])
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app1 import instrumentation
+from app1.models import UserLoginInfo
+from api.benchmark import ASGIConnection, BenchmarkError, MixEnvCommand, ensure_user, percentile
+
+
+class Command(MixEnvCommand, BaseCommand):
+    help = (
+        "Sustained re-authentication in-process: clients renewing their access token by logging "
+        "in again vs through /api/token/refresh. Reports renewals/s, latency, bcrypt time and new "
+        "session rows. Rate limits are off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=16, help="Concurrent clients.")
+        parser.add_argument("--renewals", type=int, default=20, help="Token renewals per client.")
+        parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Cost of the benchmark user's hash.")
+        parser.add_argument("--user", default="bench-refresh")
+        parser.add_argument("--password", default="bench-password")
+
+    def handle(self, *args, **options):
+        try:
+            if self.rerun_with_mix_env():
+                return
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+        ensure_user(options["user"], options["password"], options["bcrypt_rounds"])
+
+        results = {}
+        for mode in ("login", "refresh"):
+            sessions = UserLoginInfo.objects.filter(user__user_name=options["user"]).count()
+            try:
+                results[mode] = stats = asyncio.run(self.run(mode, options))
+            except BenchmarkError as exc:
+                raise CommandError(str(exc))
+            stats["new_sessions"] = (
+                UserLoginInfo.objects.filter(user__user_name=options["user"]).count() - sessions - options["clients"]
+            )
+            self.stdout.write(
+                f"{mode:<8} {stats['rps']:>7,.0f} renewals/s   p50 {stats['p50']:>7.1f} ms   "
+                f"p99 {stats['p99']:>7.1f} ms   bcrypt {stats['bcrypt_ms']:>7.2f} ms/renewal   "
+                f"new sessions {stats['new_sessions']:,}"
+            )
+
+        self.stdout.write(
+            f"refresh vs login: {results['refresh']['rps'] / results['login']['rps']:.1f}x renewals/s, "
+            f"bcrypt {results['refresh']['bcrypt_ms']:.2f} vs {results['login']['bcrypt_ms']:.2f} ms per renewal"
+        )
+
+    async def run(self, mode, options):
+        from Task1.asgi import application
+
+        conn = ASGIConnection(application)
+        credentials = json.dumps({"user_name": options["user"], "user_password": options["password"]}).encode()
+        latencies = []
+        bcrypt_seconds = 0.0
+
+        async def post(path, body):
+            nonlocal bcrypt_seconds
+            # the hashing pool reports bcrypt time to the request's metrics
+            metrics, token = instrumentation.start_request()
+            start = time.perf_counter()
+            try:
+                status, response = await conn.request("POST", path, body, auth=False)
+            finally:
+                instrumentation.end_request(token)
+            latencies.append(time.perf_counter() - start)
+            bcrypt_seconds += metrics.timings.get("bcrypt", 0.0)
+            if status != 200:
+                raise BenchmarkError(f"{path}: {status} {response[:200]!r}")
+            return json.loads(response)["data"]
+
+        # every client starts from one login in both modes; only the renewals are measured
+        first = await asyncio.gather(*(post("/api/login", credentials) for _ in range(options["clients"])))
+        latencies.clear()
+        bcrypt_seconds = 0.0
+
+        async def renew(tokens):
+            for _ in range(options["renewals"]):
+                if mode == "login":
+                    tokens = await post("/api/login", credentials)
+                else:
+                    tokens = await post("/api/token/refresh", json.dumps({"refresh_token": tokens["refresh_token"]}).encode())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(renew(tokens) for tokens in first))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        renewals = len(latencies)
+        return {
+            "rps": renewals / elapsed,
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "bcrypt_ms": bcrypt_seconds / renewals * 1000,
+        }
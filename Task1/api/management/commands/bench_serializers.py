@@ -0,0 +1,65 @@
+import datetime
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from app1.models import UserInfo
+from api.renderers import ORJSONRenderer
+from api.serializers import UserInfoRowSerializer, UserInfoSerializer
+from api.views import remove_password
+
+
+class Command(BaseCommand):
+    help = "Rows/sec of the GetUsers list path: UserInfoSerializer vs UserInfoRowSerializer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        n = options["rows"]
+        today = datetime.date.today()
+
+        users = [
+            UserInfo(
+                user_id=uuid.uuid4(),
+                user_name=f"user{i}",
+                user_email=f"user{i}@example.com",
+                user_password="$2b$12$" + "x" * 53,
+                user_date_of_creation=today,
+                user_role=3,
+                user_fullname=f"User {i}",
+            )
+            for i in range(n)
+        ]
+        fields = UserInfoRowSerializer.fields
+        columns, _ = UserInfoRowSerializer.plan(fields)
+        rows = [tuple(getattr(u, c) for c in columns) for u in users]
+
+        def drf():
+            data = [remove_password(u) for u in UserInfoSerializer(users, many=True).data]
+            return JSONRenderer().render(data)
+
+        def fast():
+            return ORJSONRenderer().render(UserInfoRowSerializer.serialize(rows, fields))
+
+        if json.loads(drf()) != json.loads(fast()):
+            self.stderr.write("outputs differ")
+            return
+
+        results = {}
+        for name, func in (("UserInfoSerializer", drf), ("UserInfoRowSerializer", fast)):
+            best = min(self._time(func) for _ in range(options["repeat"]))
+            results[name] = n / best
+            self.stdout.write(f"{name:<24} {n / best:>12,.0f} rows/s  ({best * 1000:.1f} ms for {n} rows)")
+
+        speedup = results["UserInfoRowSerializer"] / results["UserInfoSerializer"]
+        self.stdout.write(f"speedup: {speedup:.1f}x")
+
+    def _time(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import BenchmarkError, add_load_arguments, add_stack_arguments, compare_stacks, split_paths
+
+DEFAULT_PATHS = "/api/get_users?limit=50,/api/get_all_user_details?limit=50,/api/get_teams?limit=50"
+
+
+class Command(BaseCommand):
+    help = (
+        "req/s and latency of the production server (gunicorn.conf.py) with 1, 2, 4, ... up to "
+        "--max-workers uvicorn workers. The load comes from this one process, so leave it a core."
+    )
+
+    def add_arguments(self, parser):
+        add_load_arguments(parser, DEFAULT_PATHS)
+        add_stack_arguments(parser)
+        parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        counts = []
+        n = 1
+        while n < options["max_workers"]:
+            counts.append(n)
+            n *= 2
+        counts.append(options["max_workers"])
+
+        stacks = [(f"{n} worker{'s' if n > 1 else ''}", {"WEB_CONCURRENCY": str(n)}) for n in counts]
+        try:
+            results = compare_stacks(stacks, options, split_paths(options["paths"]), self.stdout.write, gunicorn=True)
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        base = results[stacks[0][0]]["rps"]
+        self.stdout.write("scaling: " + ", ".join(
+            f"{name} {stats['rps'] / base:.2f}x" for name, stats in results.items()
+        ))
@@ -0,0 +1,145 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class PaginationError(ValueError):
+    """Bad ``cursor`` / ``limit`` / ``fields`` query parameter."""
+
+
+def select_fields(request, allowed):
+    """
+    Columns requested through ``?fields=a,b,c``, restricted to ``allowed``.
+    Without the parameter every allowed column is returned.
+    """
+    raw = request.query_params.get("fields")
+    if not raw:
+        return list(allowed)
+
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, fields=None):
+    """
+    The ordering values held by ``cursor``. Given the ordering's model
+    ``fields``, there must be one value per field, each converted with the
+    field's ``to_python``, so a forged or truncated cursor is a bad request
+    rather than an error in the query.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list):
+        raise PaginationError("Invalid cursor")
+    if fields is None:
+        return values
+
+    if len(values) != len(fields):
+        raise PaginationError("Invalid cursor")
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if any(value is None for value in values):
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over a fixed ascending ordering.
+
+    The cursor holds the ordering values of the last row sent, and the next
+    page is fetched with ``WHERE (ordering) > (cursor) ... LIMIT n``, so a
+    page costs the same however deep the client is. ``ordering`` must be
+    unique per row and non-null (coalesce nullable columns first).
+    """
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+
+    def get_limit(self, request):
+        raw = request.query_params.get("limit")
+        if raw is None:
+            return settings.API_PAGE_SIZE
+        try:
+            limit = int(raw)
+        except ValueError:
+            raise PaginationError("limit must be an integer")
+        if limit < 1:
+            raise PaginationError("limit must be positive")
+        return min(limit, settings.API_MAX_PAGE_SIZE)
+
+    def after(self, values):
+        if len(values) != len(self.ordering):
+            raise PaginationError("Invalid cursor")
+
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            step = Q(**{f"{field}__gt": values[i]})
+            for prev, value in zip(self.ordering[:i], values[:i]):
+                step &= Q(**{prev: value})
+            condition |= step
+        return condition
+
+    def ordered(self, queryset, request):
+        """``queryset`` in key order, starting after ``?cursor=`` if given."""
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            queryset = queryset.filter(self.after(decode_cursor(cursor, self.fields(queryset))))
+        return queryset
+
+    def fields(self, queryset):
+        """Model fields of the ordering in ``queryset``, annotations included."""
+        annotations = queryset.query.annotations
+        return [
+            annotations[name].output_field if name in annotations else queryset.model._meta.get_field(name)
+            for name in self.ordering
+        ]
+
+    def paginate(self, queryset, request, columns=None):
+        """
+        Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last
+        page. ``queryset`` may yield model instances, ``values()`` dicts or
+        ``values_list()`` tuples; for tuples pass the selected ``columns``.
+        """
+        limit = self.get_limit(request)
+        queryset = self.ordered(queryset, request)
+        return self._page(list(queryset[:limit + 1]), limit, columns)
+
+    async def apaginate(self, queryset, request, columns=None):
+        """paginate() with the async ORM."""
+        limit = self.get_limit(request)
+        queryset = self.ordered(queryset, request)
+        return self._page([row async for row in queryset[:limit + 1]], limit, columns)
+
+    def _page(self, rows, limit, columns):
+        if len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        last = rows[-1]
+        if columns is not None:
+            last = dict(zip(columns, last))
+        return rows, encode_cursor([_value(last, f) for f in self.ordering])
+
+
+def _value(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
@@ -0,0 +1,54 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from app1.instrumentation import measure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_fallback = JSONEncoder()
+
+
+def dumps(data):
+    """
+    Compact UTF-8 JSON bytes, identical to what DRF's JSONRenderer produces.
+    Uses orjson when it is installed and DRF's encoder otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_fallback.default, option=orjson.OPT_UTC_Z)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by ``dumps`` (orjson when available)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with measure("serialize"):
+            return dumps(data)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, selected with ``?format=ndjson`` or
+    ``Accept: application/x-ndjson``.
+
+    List views stream their rows themselves (api.streaming); this renderer
+    only handles the non-streamed responses such as errors, which come out
+    as a single line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data) + b"\n"
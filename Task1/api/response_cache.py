@@ -0,0 +1,78 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+
+
+class CachedPage:
+    """
+    One cacheable GET: its ETag and where its body is kept.
+
+    The ETag is derived from the request (path, query, media type) and the
+    versions of the data behind it, so it can be checked without the body:
+    a poll with a matching If-None-Match costs one cache read. A write bumps
+    a version (app1.data_versions), which changes the ETag and the key.
+    ``versions`` are those of the page's scopes (``versions`` or
+    ``aversions`` there).
+    """
+
+    def __init__(self, request, versions, media_type):
+        raw = f"{request.get_full_path()}|{media_type}|{versions}"
+        self.etag = '"%s"' % hashlib.sha256(raw.encode()).hexdigest()[:32]
+        self.key = f"api:page:{self.etag[1:-1]}"
+        self.media_type = media_type
+        # versions are write times in ns
+        self.written_at = max(versions) / 1e9 if versions else 0
+
+    def written_recently(self):
+        """
+        Whether the last write may not have reached the replicas yet
+        (REPLICA_STICKY_SECONDS): a page read from one now could predate it.
+        """
+        return time.time() - self.written_at < settings.REPLICA_STICKY_SECONDS
+
+    def not_modified(self, request):
+        header = request.headers.get("If-None-Match")
+        return bool(header) and (self.etag in parse_etags(header) or header.strip() == "*")
+
+    def response(self, body):
+        response = HttpResponse(body, content_type=self.media_type)
+        response["ETag"] = self.etag
+        # clients may keep the body but must revalidate each time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def not_modified_response(self):
+        response = HttpResponseNotModified()
+        response["ETag"] = self.etag
+        return response
+
+    def lookup(self, request):
+        """304 / cached 200 for ``request``, or None on a miss."""
+        if self.not_modified(request):
+            return self.not_modified_response()
+
+        body = _cache().get(self.key)
+        return None if body is None else self.response(body)
+
+    async def alookup(self, request):
+        if self.not_modified(request):
+            return self.not_modified_response()
+
+        body = await _cache().aget(self.key)
+        return None if body is None else self.response(body)
+
+    def store(self, body):
+        _cache().set(self.key, body, timeout=settings.API_RESPONSE_CACHE_SECONDS)
+
+    async def astore(self, body):
+        await _cache().aset(self.key, body, timeout=settings.API_RESPONSE_CACHE_SECONDS)
+
+
+def _cache():
+    return caches[settings.API_RESPONSE_CACHE_ALIAS]
@@ -0,0 +1,74 @@
+from django.db import models
+from django.utils import timezone
+
+
+def _uuid(value):
+    return str(value)
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def _datetime(value):
+    # same output as DRF's DateTimeField: current timezone, "Z" for UTC
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def _converter(field):
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, models.UUIDField):
+        return _uuid
+    if isinstance(field, models.DateTimeField):
+        return _datetime
+    if isinstance(field, models.DateField):
+        return _date
+    return None
+
+
+class RowSerializer:
+    """
+    Read-only serializer for list responses.
+
+    Works on ``values_list()`` tuples with a column plan built once per
+    model, so rows skip DRF's per-field objects entirely. The output matches
+    ModelSerializer with ``fields = "__all__"`` (foreign keys as their pk
+    under the field name). Excluded columns are never part of the plan, so
+    they are never selected.
+    """
+
+    def __init__(self, model, exclude=()):
+        self.model = model
+        self.columns = {}
+
+        for field in model._meta.concrete_fields:
+            if field.name not in exclude:
+                self.columns[field.name] = (field.attname, _converter(field))
+
+        self.fields = list(self.columns)
+
+    def plan(self, fields=None):
+        """``(columns to select, converters)`` for ``fields``, in order."""
+        fields = self.fields if fields is None else fields
+        return (
+            [self.columns[f][0] for f in fields],
+            [self.columns[f][1] for f in fields],
+        )
+
+    def serialize(self, rows, fields=None):
+        fields = self.fields if fields is None else fields
+        converters = self.plan(fields)[1]
+
+        if not any(converters):
+            return [dict(zip(fields, row)) for row in rows]
+
+        steps = list(zip(fields, converters))
+        return [
+            {name: value if convert is None or value is None else convert(value)
+             for (name, convert), value in zip(steps, row)}
+            for row in rows
+        ]
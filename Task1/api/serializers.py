@@ -1,5 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
-from app1.models import  UserInfo , TeamInfo , TeamUsers
+from app1.models import  UserInfo , TeamInfo , TeamUsers, ROLE_CHOICES
+from api.row_serializers import RowSerializer
+
+
+# user names starting with this are reserved for the rows of the load
+# benchmarks (api.benchmark), which seed() deletes by prefix
+RESERVED_USER_NAME_PREFIX = "~"
 
 
 class UserInfoSerializer(serializers.ModelSerializer):
@@ -7,6 +14,19 @@ class UserInfoSerializer(serializers.ModelSerializer):
         model = UserInfo
         fields = "__all__"
 
+    def validate_user_name(self, value):
+        if value.startswith(RESERVED_USER_NAME_PREFIX) and not settings.API_ALLOW_RESERVED_USER_NAMES:
+            raise serializers.ValidationError(f'User names cannot start with "{RESERVED_USER_NAME_PREFIX}".')
+        return value
+
+class UserInfoBulkSerializer(UserInfoSerializer):
+    # uniqueness is checked for the whole batch in one query (api.bulk)
+    class Meta(UserInfoSerializer.Meta):
+        extra_kwargs = {
+            "user_name": {"validators": []},
+            "user_email": {"validators": []},
+        }
+
 class TeamInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = TeamInfo
@@ -15,4 +35,14 @@ class TeamInfoSerializer(serializers.ModelSerializer):
 class TeamUsersSerializer(serializers.ModelSerializer):
     class Meta:
         model = TeamUsers
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+class TeamMemberSerializer(serializers.Serializer):
+    # one row of a batch registration; the team comes from the URL and the
+    # users are resolved together in api.bulk
+    user = serializers.UUIDField()
+    team_user_team_role = serializers.ChoiceField(choices=ROLE_CHOICES)
+
+
+# read-only fast path for list responses, see api.row_serializers
+UserInfoRowSerializer = RowSerializer(UserInfo, exclude=("user_password",))
@@ -0,0 +1,57 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from api.renderers import NDJSONRenderer, dumps
+
+
+def wants_ndjson(request):
+    return isinstance(getattr(request, "accepted_renderer", None), NDJSONRenderer)
+
+
+def ndjson_response(request, queryset, fields, serialize):
+    """
+    Stream ``queryset`` (a ``values_list(*fields)`` queryset) as NDJSON,
+    each chunk of rows converted by ``serialize(rows, fields)`` like the
+    JSON pages of the same view.
+
+    Rows come from a server-side cursor in chunks of API_EXPORT_CHUNK_SIZE
+    and are written out one chunk at a time, so memory stays flat however
+    many rows there are. Under ASGI the body is an async iterator; given a
+    sync one Django would buffer the whole body before sending it.
+    """
+    chunk_size = settings.API_EXPORT_CHUNK_SIZE
+    # the rows are read after the view has returned, outside the request's
+    # routing state (app1.db_router): pick the database now
+    queryset = queryset.using(queryset.db)
+
+    if isinstance(request._request, ASGIRequest):
+        content = _aiter_lines(queryset, fields, chunk_size, serialize)
+    else:
+        content = _iter_lines(queryset, fields, chunk_size, serialize)
+
+    response = StreamingHttpResponse(content, content_type=NDJSONRenderer.media_type)
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _next_chunk(rows, fields, chunk_size, serialize):
+    lines = [dumps(row) for row in serialize(list(islice(rows, chunk_size)), fields)]
+    return b"\n".join(lines) + b"\n" if lines else b""
+
+
+def _iter_lines(queryset, fields, chunk_size, serialize):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while chunk := _next_chunk(rows, fields, chunk_size, serialize):
+        yield chunk
+
+
+async def _aiter_lines(queryset, fields, chunk_size, serialize):
+    # fetching and encoding both happen off the event loop, one chunk per hop
+    rows = queryset.iterator(chunk_size=chunk_size)
+    next_chunk = sync_to_async(_next_chunk)
+    while chunk := await next_chunk(rows, fields, chunk_size, serialize):
+        yield chunk
@@ -1,3 +1,402 @@
-from django.test import TestCase
+import asyncio
+import json
+import secrets
+import threading
+import unittest
+from datetime import timedelta
 
-# Create your tests here.
+import bcrypt
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from api.benchmark import DEFAULT_MIX, SEED_PREFIX, seed
+from api.bulk import create_members, validate_members
+from api.hashing import HashingPool, HashingPoolFull, get_bulk_hashing_pool, get_hashing_pool
+from api.pagination import encode_cursor
+from app1.data_versions import bump
+from app1.models import UserInfo, UserLoginInfo, TeamInfo, TeamUsers
+from app1.testing import LoggedInUserMixin, create_user
+
+
+@override_settings(API_RATE_LIMITS={}, API_RESPONSE_CACHE=False)
+class BulkEndpointTests(LoggedInUserMixin, TestCase):
+
+    user_name = "batcher"
+    user_role = 1
+
+    def setUp(self):
+        self.token = self.login()["token"]
+
+    def post(self, path, data):
+        return self.client.post(path, data, content_type="application/json", HTTP_AUTHORIZATION=self.token)
+
+    def new_user(self, name, email=None):
+        return {"user_name": name, "user_email": email or f"{name}@example.com", "user_password": "pw",
+                "user_role": 3, "user_fullname": name.title()}
+
+    def test_bulk_users_reports_each_row(self):
+        response = self.post("/api/bulk_create_users", {"users": [
+            self.new_user("bulk1"),
+            self.new_user("batcher"),
+            self.new_user("bulk2", email="bulk1@example.com"),
+            {"user_name": "bulk3"},
+            self.new_user("bulk1", email="other@example.com"),
+        ]})
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["data"]
+        self.assertEqual([row["status"] for row in results], ["created", "invalid", "invalid", "invalid", "invalid"])
+        self.assertEqual([row["index"] for row in results], [0, 1, 2, 3, 4])
+        self.assertIn("already exists", results[1]["errors"]["user_name"][0])
+        self.assertIn("Duplicate user_email", results[2]["errors"]["user_email"][0])
+        self.assertIn("Duplicate user_name", results[4]["errors"]["user_name"][0])
+        created = UserInfo.objects.get(user_name="bulk1")
+        self.assertEqual(str(created.user_id), results[0]["user_id"])
+        self.assertTrue(bcrypt.checkpw(b"pw", created.user_password.encode()))
+
+    @override_settings(API_BULK_MAX_ROWS=2)
+    def test_bulk_users_size_limit(self):
+        response = self.post("/api/bulk_create_users", [self.new_user(f"over{i}") for i in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserInfo.objects.filter(user_name__startswith="over").exists())
+
+    def test_bulk_members_reports_each_row(self):
+        team = TeamInfo.objects.create(user=self.user, team_id="T1", team_name="squad", team_created_by="batcher")
+        joined, fresh = UserInfo.objects.bulk_create([
+            UserInfo(user_name=name, user_email=f"{name}@example.com", user_password="x", user_role=3,
+                     user_fullname=name)
+            for name in ("joined", "fresh")
+        ])
+        TeamUsers.objects.create(team=team, user=joined, team_user_team_role=3)
+
+        response = self.post("/api/register_teammates/squad", {"members": [
+            {"user": str(fresh.user_id), "team_user_team_role": 3},
+            {"user": str(joined.user_id), "team_user_team_role": 3},
+            {"user": str(fresh.user_id), "team_user_team_role": 2},
+            {"user": "00000000-0000-0000-0000-000000000000", "team_user_team_role": 3},
+            {"user": str(fresh.user_id), "team_user_team_role": 99},
+        ]})
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["data"]
+        self.assertEqual([row["status"] for row in results], ["created", "invalid", "invalid", "invalid", "invalid"])
+        self.assertEqual(TeamUsers.objects.filter(team=team, user=fresh).count(), 1)
+
+    def test_removed_member_can_rejoin(self):
+        team = TeamInfo.objects.create(user=self.user, team_id="T1", team_name="squad", team_created_by="batcher")
+        TeamUsers.objects.create(team=team, user=self.user, team_user_team_role=3, team_user_deleted=1)
+
+        response = self.post("/api/register_teammates/squad",
+                             {"members": [{"user": str(self.user.user_id), "team_user_team_role": 2}]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TeamUsers.objects.filter(team=team, user=self.user).count(), 2)
+
+        # both memberships, one page each
+        rows, query = [], "limit=1"
+        while query:
+            body = self.client.get(f"/api/get_teams?{query}", HTTP_AUTHORIZATION=self.token).json()
+            rows.extend(body["data"])
+            query = body["meta"]["next_cursor"] and f"limit=1&cursor={body['meta']['next_cursor']}"
+        self.assertEqual(sorted(row["team_user_deleted"] for row in rows), [0, 1])
+        self.assertNotIn("team_user_key", rows[0])
+
+    @override_settings(API_BULK_MAX_ROWS=2)
+    def test_bulk_members_size_limit(self):
+        TeamInfo.objects.create(user=self.user, team_id="T1", team_name="squad", team_created_by="batcher")
+        rows = [{"user": str(self.user.user_id), "team_user_team_role": 3}] * 3
+        self.assertEqual(self.post("/api/register_teammates/squad", rows).status_code, 400)
+        self.assertFalse(TeamUsers.objects.exists())
+
+    def test_concurrent_member_registration_conflicts(self):
+        team = TeamInfo.objects.create(user=self.user, team_id="T1", team_name="squad", team_created_by="batcher")
+        _, valid = validate_members(team, [{"user": str(self.user.user_id), "team_user_team_role": 3}])
+        self.assertEqual(len(valid), 1)
+        # another batch registers the same member between validation and insert
+        TeamUsers.objects.create(team=team, user=self.user, team_user_team_role=3)
+        with self.assertRaises(IntegrityError):
+            create_members(team, valid)
+        self.assertEqual(TeamUsers.objects.filter(team=team).count(), 1)
+
+    def test_bulk_hashing_has_its_own_pool(self):
+        self.assertIsNot(get_bulk_hashing_pool(), get_hashing_pool())
+        self.assertLessEqual(get_bulk_hashing_pool().max_workers, get_hashing_pool().max_workers)
+
+
+class ResponseCacheTests(LoggedInUserMixin, TestCase):
+
+    user_name = "poller"
+
+    def setUp(self):
+        cache.clear()
+        self.token = self.login()["token"]
+
+    def get(self, path, **headers):
+        return self.client.get(path, HTTP_AUTHORIZATION=self.token, **headers)
+
+    def test_unchanged_poll_is_304_without_queries(self):
+        first = self.get("/api/get_users")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            again = self.get("/api/get_users", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], etag)
+
+        with self.assertNumQueries(0):
+            cached = self.get("/api/get_users")
+        self.assertEqual(cached.content, first.content)
+
+    def test_write_changes_etag(self):
+        etag = self.get("/api/get_users")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                "/api/update_user_details/poller", {"user_fullname": "Renamed"},
+                content_type="application/json", HTTP_AUTHORIZATION=self.token,
+            )
+
+        response = self.get("/api/get_users", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["data"][0]["user_fullname"], "Renamed")
+
+    # "default" stands in for a replica
+    @override_settings(DATABASE_REPLICAS=["default"], REPLICA_STICKY_SECONDS=60)
+    def test_replica_page_after_write_is_not_cached(self):
+        bump("users")
+        response = self.get("/api/get_users")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        # read again, not served from the cache
+        with self.assertNumQueries(1):
+            self.get("/api/get_users")
+
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.assertIn("ETag", self.get("/api/get_users"))
+            with self.assertNumQueries(0):
+                self.get("/api/get_users")
+
+
+@override_settings(API_RESPONSE_CACHE=False)
+class ListFormatTests(LoggedInUserMixin, TestCase):
+
+    user_name = "exporter"
+
+    def setUp(self):
+        self.token = self.login()["token"]
+
+    def test_ndjson_rows_match_json_rows(self):
+        for path in ("/api/get_users", "/api/get_all_user_details"):
+            with self.subTest(path=path):
+                page = self.client.get(path, HTTP_AUTHORIZATION=self.token).json()["data"]
+                export = self.client.get(f"{path}?format=ndjson", HTTP_AUTHORIZATION=self.token)
+                lines = b"".join(export.streaming_content).splitlines()
+                self.assertEqual([json.loads(line) for line in lines], page)
+
+
+@override_settings(API_RESPONSE_CACHE=False)
+class KeysetPaginationTests(LoggedInUserMixin, TestCase):
+    """Paging through /api/get_users on any database backend."""
+
+    user_name = "pager"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # three users share a creation time, so user_id alone orders them
+        created = timezone.now()
+        for name in ("tie1", "tie2", "tie3", "later"):
+            create_user(name)
+        UserInfo.objects.filter(user_name__startswith="tie").update(user_date_of_creation=created)
+        UserInfo.objects.filter(user_name="later").update(user_date_of_creation=created + timedelta(seconds=1))
+
+    def setUp(self):
+        self.token = self.login()["token"]
+
+    def page(self, query):
+        return self.client.get(f"/api/get_users?{query}", HTTP_AUTHORIZATION=self.token)
+
+    def test_pages_follow_key_order_through_ties(self):
+        expected = list(
+            UserInfo.objects.order_by("user_date_of_creation", "user_id").values_list("user_name", flat=True)
+        )
+        names, query = [], "limit=2"
+        while True:
+            body = self.page(query).json()
+            names.extend(row["user_name"] for row in body["data"])
+            cursor = body["meta"]["next_cursor"]
+            if cursor is None:
+                break
+            query = f"limit=2&cursor={cursor}"
+        self.assertEqual(names, expected)
+
+    def test_report_cursors_round_trip(self):
+        team = TeamInfo.objects.create(user=self.user, team_id="T1", team_name="pages", team_created_by="pager")
+        for user in UserInfo.objects.all():
+            TeamUsers.objects.create(team=team, user=user, team_user_team_role=3)
+
+        for path in ("get_all_user_details", "get_teams"):
+            with self.subTest(path):
+                first = self.client.get(f"/api/{path}?limit=1", HTTP_AUTHORIZATION=self.token).json()
+                cursor = first["meta"]["next_cursor"]
+                response = self.client.get(f"/api/{path}?limit=1&cursor={cursor}", HTTP_AUTHORIZATION=self.token)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response.json()["data"], first["data"])
+
+    def test_forged_and_truncated_cursors_are_bad_requests(self):
+        user = UserInfo.objects.get(user_name="tie1")
+        cursors = {
+            "not base64 json": "!!!",
+            "not a list": encode_cursor({"user_id": str(user.user_id)}),
+            "truncated": encode_cursor([user.user_date_of_creation]),
+            "too long": encode_cursor([user.user_date_of_creation, str(user.user_id), 1]),
+            "wrong date": encode_cursor(["yesterday", str(user.user_id)]),
+            "wrong id": encode_cursor([user.user_date_of_creation, "not-a-uuid"]),
+            "wrong type": encode_cursor([[], {}]),
+            "null": encode_cursor([None, None]),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                response = self.page(f"cursor={cursor}")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["meta"]["message"], "Invalid cursor")
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "seed() refreshes the materialized views")
+@override_settings(API_RATE_LIMITS={})
+class BenchmarkSeedTests(TestCase):
+
+    def test_reseeding_keeps_real_users(self):
+        UserInfo.objects.create(
+            user_name="loader", user_email="loader@example.com", user_password="x",
+            user_role=3, user_fullname="Loader",
+        )
+        seed(3, logins_per_user=1, rounds=4)
+        seed(2, logins_per_user=1, rounds=4)
+        self.assertEqual(UserInfo.objects.filter(user_name__startswith=SEED_PREFIX).count(), 2)
+        self.assertTrue(UserInfo.objects.filter(user_name="loader").exists())
+
+    @override_settings(API_ALLOW_RESERVED_USER_NAMES=True)
+    def test_seeding_deletes_users_the_mix_created(self):
+        create = next(entry for entry in DEFAULT_MIX if entry["name"] == "create_user")
+        body = json.loads(json.dumps(create["body"]).replace("{prefix}", SEED_PREFIX).replace("{n}", "1"))
+        body["user_password"] = "pw"
+        response = self.client.post("/api/create_user", body, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+        seed(1, logins_per_user=1, rounds=4)
+        self.assertFalse(UserInfo.objects.filter(user_name=body["user_name"]).exists())
+
+    def test_api_rejects_reserved_user_names(self):
+        response = self.client.post("/api/create_user", {
+            "user_name": f"{SEED_PREFIX}9", "user_email": "sneaky@example.com", "user_password": "pw",
+            "user_role": 3, "user_fullname": "Sneaky",
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("user_name", response.json()["data"])
+
+
+class RefreshTokenTests(LoggedInUserMixin, TestCase):
+
+    user_name = "renewer"
+
+    def setUp(self):
+        self.tokens = self.login()
+
+    def refresh(self, token):
+        return self.client.post("/api/token/refresh", {"refresh_token": token}, content_type="application/json")
+
+    def test_refresh_rotates_tokens_in_place(self):
+        with self.assertNumQueries(2):
+            response = self.refresh(self.tokens["refresh_token"])
+        self.assertEqual(response.status_code, 200)
+        renewed = response.json()["data"]
+        self.assertEqual(UserLoginInfo.objects.count(), 1)
+
+        self.assertEqual(self.client.get("/api/get_users", HTTP_AUTHORIZATION=self.tokens["token"]).status_code, 401)
+        self.assertEqual(self.client.get("/api/get_users", HTTP_AUTHORIZATION=renewed["token"]).status_code, 200)
+
+    def test_reused_refresh_token_revokes_session(self):
+        renewed = self.refresh(self.tokens["refresh_token"]).json()["data"]
+
+        self.assertEqual(self.refresh(self.tokens["refresh_token"]).status_code, 401)
+        self.assertFalse(UserLoginInfo.objects.get().is_active)
+        self.assertEqual(self.refresh(renewed["refresh_token"]).status_code, 401)
+
+
+class LoginRateLimitTests(TestCase):
+
+    @override_settings(API_RATE_LIMITS={"login": {"user": "2/min"}})
+    def test_login_is_limited_before_any_query(self):
+        # the buckets outlive the test, so use a name no other test logs in with
+        body = {"user_name": f"flood-{secrets.token_hex(4)}", "user_password": "guess"}
+        for _ in range(2):
+            response = self.client.post("/api/login", body, content_type="application/json")
+            self.assertEqual(response.status_code, 401)
+
+        with self.assertNumQueries(0):
+            response = self.client.post("/api/login", body, content_type="application/json")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+    @override_settings(API_RATE_LIMITS={"create_user": {"ip": "2/min"}})
+    def test_forwarded_for_does_not_reset_the_ip_bucket(self):
+        # a fresh address, since the buckets outlive the test
+        address = f"10.{secrets.randbelow(256)}.{secrets.randbelow(256)}.{secrets.randbelow(256)}"
+        statuses = [
+            self.client.post("/api/create_user", {}, content_type="application/json",
+                             REMOTE_ADDR=address, HTTP_X_FORWARDED_FOR=f"203.0.113.{n}").status_code
+            for n in range(4)
+        ]
+        self.assertEqual(statuses, [400, 400, 429, 429])
+
+
+class HashingPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = HashingPool(2, 2, name="test-hash")
+        self.addCleanup(self.pool._executor.shutdown)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def hold_slot(self):
+        self.pool._reserve()
+        return self.pool._submit(self.release.wait)
+
+    def assertFreeSlots(self, count):
+        # every free slot can be taken at once, and not one more
+        self.pool._reserve(count)
+        with self.assertRaises(HashingPoolFull):
+            self.pool._reserve(1)
+        for _ in range(count):
+            self.pool._slots.release()
+
+    async def test_batch_is_shed_whole(self):
+        for _ in range(3):
+            self.hold_slot()
+        with self.assertRaises(HashingPoolFull):
+            await self.pool.hashpw_many([b"a", b"b"])
+        self.assertFreeSlots(1)
+
+    async def test_cancelled_batch_gives_its_slots_back(self):
+        self.hold_slot()
+        self.hold_slot()
+        batch = asyncio.ensure_future(self.pool.hashpw_many([b"a", b"b"]))
+        await asyncio.sleep(0)
+        self.assertFreeSlots(0)
+        batch.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await batch
+        self.assertFreeSlots(2)
+
+    async def test_failed_batch_gives_its_slots_back(self):
+        with self.assertRaises(TypeError):
+            await self.pool.hashpw_many(["not bytes", b"b", b"c"])
+        self.pool._executor.shutdown(wait=True)
+        self.assertFreeSlots(4)
+
+    async def test_slots_are_released_after_a_batch(self):
+        passwords = [b"a", b"b", b"c"]
+        hashed = await self.pool.hashpw_many(passwords)
+        self.assertTrue(all(map(bcrypt.checkpw, passwords, hashed)))
+        self.assertFreeSlots(4)
@@ -0,0 +1,149 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+from app1 import instrumentation
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """``"10/min"`` -> ``(10, 10 / 60)``: bucket capacity and tokens added per second."""
+    count, _, period = rate.partition("/")
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+class BaseRateLimiter:
+    """
+    Token buckets by key. ``consume`` takes one token from the bucket and
+    returns ``(allowed, retry_after_seconds)``; a bucket holds up to
+    ``capacity`` tokens and regains ``refill`` tokens per second.
+    """
+
+    def consume(self, key, capacity, refill):
+        raise NotImplementedError
+
+    async def aconsume(self, key, capacity, refill):
+        return await sync_to_async(self.consume, thread_sensitive=False)(key, capacity, refill)
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """
+    Buckets in this process (LRU bounded). Each server process limits on its
+    own, so the effective limit is multiplied by the number of processes.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / refill
+
+    async def aconsume(self, key, capacity, refill):
+        return self.consume(key, capacity, refill)
+
+
+# refill, take a token and store the bucket in one round trip; the key
+# expires once a full bucket would have been refilled
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """
+    Buckets on a Redis-protocol server shared by every process and replica.
+    Redis errors are logged and the request is let through: the limiter
+    must not take login down with it.
+    """
+
+    def __init__(self, location="redis://localhost:6379/0", key_prefix="ratelimit", client_class="redis.Redis"):
+        self.client = import_string(client_class).from_url(location)
+        self.key_prefix = key_prefix
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key, capacity, refill):
+        try:
+            allowed, tokens = self.script(keys=[f"{self.key_prefix}:{key}"], args=[capacity, refill, time.time()])
+        except Exception:
+            logger.exception("rate limiter unavailable, allowing request")
+            return True, 0.0
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / refill
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        config = settings.API_RATE_LIMIT
+        _limiter = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _limiter
+
+
+def client_ip(request):
+    # REMOTE_ADDR, or the address REST_FRAMEWORK["NUM_PROXIES"] trusted
+    # proxies put in X-Forwarded-For
+    return BaseThrottle().get_ident(request)
+
+
+async def check_rate(request, scope, user_name=None):
+    """
+    Take a token from each of ``scope``'s buckets in API_RATE_LIMITS (by
+    client IP, then by user name) and return the seconds to wait if one is
+    empty, or None. Costs no database query or hashing.
+    """
+    limits = settings.API_RATE_LIMITS.get(scope)
+    if not limits:
+        return None
+
+    keys = {"ip": client_ip(request), "user": str(user_name).lower()[:64] if user_name else None}
+    limiter = get_rate_limiter()
+    for kind, rate in limits.items():
+        if keys.get(kind) is None:
+            continue
+        capacity, refill = parse_rate(rate)
+        allowed, retry_after = await limiter.aconsume(f"{scope}:{kind}:{keys[kind]}", capacity, refill)
+        instrumentation.count_rate_limit(scope, kind, allowed)
+        if not allowed:
+            return max(1, math.ceil(retry_after))
+    return None
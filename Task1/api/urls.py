@@ -1,12 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from api.views import (Login, Logout, CreateUser,GetUsers,UpdateUser,DeleteUser,UserInfoView,RegisterTeam,RegisterTeamMates,GetTeamInfo)
+from api.views import (Login, Logout, RefreshToken, CreateUser,BulkCreateUser,GetUsers,UpdateUser,DeleteUser,UserInfoView,RegisterTeam,RegisterTeamMates,GetTeamInfo,
+                       AsyncGetUsers,AsyncUserInfoView,AsyncGetTeamInfo)
+
+if settings.API_ASYNC_VIEWS:
+    GetUsers, UserInfoView, GetTeamInfo = AsyncGetUsers, AsyncUserInfoView, AsyncGetTeamInfo
 
 urlpatterns = [
     path('create_user', CreateUser.as_view(), name='create'),
+    path('bulk_create_users', BulkCreateUser.as_view(), name='bulk_create'),
     path('get_users', GetUsers.as_view(), name='get'),
     path('update_user_details/<str:username>', UpdateUser.as_view(), name='update'),
     path('delete_user/<str:username>', DeleteUser.as_view(), name='delete'),
     path('login', Login.as_view(), name='login'),
+    path('token/refresh', RefreshToken.as_view(), name='token_refresh'),
     path('logout/<str:username>', Logout.as_view(), name='logout'),
     path('get_teams', GetTeamInfo.as_view()),
     path('register_team/' , RegisterTeam.as_view()),
@@ -1,43 +1,95 @@
-import bcrypt
+import hmac
 import secrets
 import jwt
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseBase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
 
-from app1.models import (UserInfo,UserLoginInfo,TeamInfo,AllUserInfo_View,AllTeamInfo_View)
-from api.serializers import UserInfoSerializer , TeamInfoSerializer , TeamUsersSerializer
-
+from app1.data_versions import abump, aversions, bump, versions
+from app1.db_router import use_replica
+from app1.instrumentation import measure
+from app1.models import (UserInfo,UserLoginInfo,TeamInfo,AllTeamInfo_View)
+from app1.reporting import schedule_refresh, team_info_rows, user_info_rows
+from app1.session_cache import token_digest
+from app1.session_store import get_session_store
+from app1.middleware import expired
+from app1.tokens import access_token, bearer, refresh_token, split_refresh_token, verify
+from api.async_views import AsyncAPIView
+from api.bulk import BulkError, batch_rows, create_members, create_users, validate_members, validate_users
+from api.hashing import HashingPoolFull, get_bulk_hashing_pool, get_hashing_pool
+from api.pagination import KeysetPagination, PaginationError, select_fields
+from api.renderers import NDJSONRenderer
+from api.response_cache import CachedPage
+from api.throttling import check_rate
+from api.streaming import ndjson_response, wants_ndjson
+from api.serializers import UserInfoSerializer , TeamInfoSerializer , TeamUsersSerializer, UserInfoRowSerializer
+
+
+
+USER_FIELDS = UserInfoRowSerializer.fields
+
+USER_INFO_VIEW_FIELDS = [
+    "user_id",
+    "user_name",
+    "user_email",
+    "user_date_of_creation",
+    "user_last_passcode_update",
+    "user_active",
+    "user_deleted",
+    "user_role",
+    "login_session_id",
+    "login_date_time",
+    "login_is_active",
+    "created_at",
+    "expires_at",
+]
+
+# team_user_key only breaks ties in the page order
+TEAM_INFO_VIEW_FIELDS = [f.attname for f in AllTeamInfo_View._meta.concrete_fields if f.attname != "team_user_key"]
+
+# list endpoints can also stream their rows with ?format=ndjson
+LIST_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
 
 
 class ApiResponse:
-    def __init__(self, response_data=None, status_code=200, message=""):
+    def __init__(self, response_data=None, status_code=200, message="", meta=None):
         self.response_data = response_data
         self.status_code = status_code
         self.message = message
+        self.meta = meta or {}
 
     def build(self):
         return Response(
             {"meta": 
                {"code": self.status_code,
-                "message": self.message},
+                "message": self.message,
+                **self.meta},
                 "data": self.response_data},
                 status=self.status_code
             )
 
 
 def verify_token(request):
+    # already verified by AuthMiddleware
+    if getattr(request, "auth_claims", None) is not None:
+        return True, None
+
     token = request.headers.get("Authorization")
 
     if not token:
         return False, ApiResponse(None, 401, "Authorization token required").build()
 
     try:
-        jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        verify(bearer(token))
     except jwt.ExpiredSignatureError:
         return False, ApiResponse(None, 401, "Token expired").build()
     except jwt.InvalidTokenError:
@@ -51,68 +103,256 @@ def remove_password(data):
     return data
 
 
-class CreateUser(APIView):
+def busy_response():
+    response = ApiResponse(None, 503, "Server busy, try again shortly").build()
+    response["Retry-After"] = "1"
+    return response
 
-    def post(self, request):
-        data = request.data.copy()
 
-        password = data.get("user_password")
+def throttled_response(retry_after):
+    response = ApiResponse(None, 429, "Too many requests, try again later").build()
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+class ListView(APIView):
+    """
+    Keyset-paginated list endpoint (``?fields=``, ``?cursor=``, ``?limit=``,
+    ``?format=ndjson``). Subclasses say which rows and columns; ``get`` runs
+    the page query synchronously, AsyncListView with the async ORM and cache API.
+    """
+
+    renderer_classes = LIST_RENDERER_CLASSES
+    pagination = None
+    allowed_fields = ()
+    message = ""
+    # data versions (app1.data_versions) the response is cached under
+    cache_scopes = ()
+    page_cache = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # pure reads: fine to serve from a replica (app1.db_router)
+        use_replica()
+
+    def get_rows(self, request):
+        raise NotImplementedError
+
+    def get_columns(self, fields):
+        return list(fields)
+
+    def serialize(self, rows, fields):
+        return [dict(zip(fields, row)) for row in rows]
+
+    def caches_page(self, request):
+        return settings.API_RESPONSE_CACHE and isinstance(request.accepted_renderer, JSONRenderer)
+
+    def prepare(self, request):
+        """
+        A response to send as is (rejected token, cached page, NDJSON
+        stream), or ``(queryset, columns, fields)`` for one page of
+        ``values_list`` rows. The first ``len(fields)`` columns line up with
+        ``fields``.
+        """
+        ok, resp = verify_token(request)
+        if not ok:
+            return resp
+
+        if self.caches_page(request):
+            self.page_cache = CachedPage(request, versions(self.cache_scopes), request.accepted_renderer.media_type)
+            cached = self.page_cache.lookup(request)
+            if cached is not None:
+                return cached
+
+        return self.prepare_query(request)
+
+    def prepare_query(self, request):
+        fields = select_fields(request, self.allowed_fields)
+        columns = self.get_columns(fields)
+        rows = self.get_rows(request)
+
+        if wants_ndjson(request):
+            rows = self.pagination.ordered(rows, request).values_list(*columns)
+            return ndjson_response(request, rows, fields, self.serialize)
+
+        columns = list(dict.fromkeys([*columns, *self.pagination.ordering]))
+        queryset = rows.values_list(*columns)
+        if (self.page_cache is not None and queryset.db in settings.DATABASE_REPLICAS
+                and self.page_cache.written_recently()):
+            # the replica may not have the write behind the current versions
+            # yet: neither cache this page nor hand out their ETag for it
+            self.page_cache = None
+        return queryset, columns, fields
+
+    def page_response(self, rows, fields, next_cursor):
+        with measure("serialize"):
+            data = self.serialize(rows, fields)
+        response = ApiResponse(data, 200, self.message, meta={"next_cursor": next_cursor}).build()
+        if self.page_cache is None:
+            return response
+
+        body = self.request.accepted_renderer.render(
+            response.data, self.request.accepted_media_type, self.get_renderer_context()
+        )
+        return self.page_cache.response(body)
+
+    def get(self, request):
+        try:
+            prepared = self.prepare(request)
+            if isinstance(prepared, HttpResponseBase):
+                return prepared
+            queryset, columns, fields = prepared
+            rows, next_cursor = self.pagination.paginate(queryset, request, columns)
+        except PaginationError as exc:
+            return ApiResponse(None, 400, str(exc)).build()
+
+        response = self.page_response(rows, fields, next_cursor)
+        if self.page_cache is not None:
+            self.page_cache.store(response.content)
+        return response
+
+
+class AsyncListView(AsyncAPIView, ListView):
+    """ListView served on the event loop through the async ORM and cache API."""
+
+    async def aprepare(self, request):
+        ok, resp = verify_token(request)
+        if not ok:
+            return resp
+
+        if self.caches_page(request):
+            current = await aversions(self.cache_scopes)
+            self.page_cache = CachedPage(request, current, request.accepted_renderer.media_type)
+            cached = await self.page_cache.alookup(request)
+            if cached is not None:
+                return cached
+
+        return self.prepare_query(request)
+
+    async def get(self, request):
+        try:
+            prepared = await self.aprepare(request)
+            if isinstance(prepared, HttpResponseBase):
+                return prepared
+            queryset, columns, fields = prepared
+            rows, next_cursor = await self.pagination.apaginate(queryset, request, columns)
+        except PaginationError as exc:
+            return ApiResponse(None, 400, str(exc)).build()
+
+        response = self.page_response(rows, fields, next_cursor)
+        if self.page_cache is not None:
+            await self.page_cache.astore(response.content)
+        return response
 
-        if password:
-            hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-            data["user_password"] = hashed
+
+class CreateUser(AsyncAPIView):
+    # no token needed (app1.middleware.AuthMiddleware)
+    public = True
+
+    async def post(self, request):
+        data = request.data.copy()
+
+        retry_after = await check_rate(request, "create_user", data.get("user_name"))
+        if retry_after:
+            return throttled_response(retry_after)
 
         serializer = UserInfoSerializer(data=data)
 
-        if serializer.is_valid():
-            serializer.save()
+        if await sync_to_async(serializer.is_valid)():
+            password = serializer.validated_data["user_password"]
+
+            try:
+                hashed = (await get_hashing_pool().hashpw(password.encode())).decode()
+            except HashingPoolFull:
+                return busy_response()
+
+            await sync_to_async(serializer.save)(user_password=hashed)
             return ApiResponse(None, 201, "User created successfully").build()
 
         return ApiResponse(serializer.errors, 400, "Validation error").build()
 
 
-class GetUsers(APIView):
+def bulk_status(results, created):
+    # all rows in: 201, some: 207 Multi-Status, none: 400
+    if created == len(results):
+        return 201
+    return 207 if created else 400
 
-    def get(self, request):
+
+class BulkCreateUser(AsyncAPIView):
+    """
+    Create many users in one request: ``[{...}, ...]`` or ``{"users": [...]}``
+    with the same fields as create_user. Valid rows are created, invalid ones
+    are reported per row by index.
+    """
+
+    async def post(self, request):
         ok, resp = verify_token(request)
         if not ok:
             return resp
 
-        users = UserInfo.objects.filter(user_deleted=0)
-        serializer = UserInfoSerializer(users, many=True)
+        try:
+            rows = batch_rows(request.data, "users")
+        except BulkError as exc:
+            return ApiResponse(None, 400, str(exc)).build()
+
+        results, valid = await sync_to_async(validate_users)(rows)
+
+        if valid:
+            try:
+                hashed = await get_bulk_hashing_pool().hashpw_many(
+                    [data["user_password"].encode() for _, data in valid]
+                )
+            except HashingPoolFull:
+                return busy_response()
 
-        cleaned = [remove_password(u) for u in serializer.data]
+            try:
+                users = await sync_to_async(create_users)(valid, [h.decode() for h in hashed])
+            except IntegrityError:
+                # a concurrent request took one of the names / emails since validation
+                return ApiResponse(None, 409, "Conflicting users created concurrently, retry").build()
 
-        return ApiResponse(cleaned, 200, "Users fetched successfully").build()
+            for (index, _), user in zip(valid, users):
+                results[index] = {"index": index, "status": "created", "user_id": str(user.user_id)}
+            # bulk_create sends no post_save
+            await abump("users")
+            schedule_refresh()
 
+        code = bulk_status(results, len(valid))
+        return ApiResponse(results, code, f"{len(valid)} of {len(rows)} users created").build()
 
-class UpdateUser(APIView):
 
-    def get_object(self, username):
-        return UserInfo.objects.filter(user_name=username).first()
+class UpdateUser(AsyncAPIView):
 
-    def patch(self, request, username):
+    async def get_object(self, username):
+        return await UserInfo.objects.filter(user_name=username).afirst()
+
+    async def patch(self, request, username):
         ok, resp = verify_token(request)
         if not ok:
             return resp
 
-        user = self.get_object(username)
+        user = await self.get_object(username)
 
         if not user:
             return ApiResponse(None, 404, "User not found").build()
 
         data = request.data.copy()
 
-        if "user_password" in data:
-            data["user_password"] = bcrypt.hashpw(
-                data["user_password"].encode(),
-                bcrypt.gensalt()
-            ).decode()
-
         serializer = UserInfoSerializer(user, data=data, partial=True)
 
-        if serializer.is_valid():
-            serializer.save()
+        if await sync_to_async(serializer.is_valid)():
+            changes = {}
+
+            if "user_password" in serializer.validated_data:
+                try:
+                    changes["user_password"] = (await get_hashing_pool().hashpw(
+                        serializer.validated_data["user_password"].encode()
+                    )).decode()
+                except HashingPoolFull:
+                    return busy_response()
+
+            await sync_to_async(serializer.save)(**changes)
             return ApiResponse(remove_password(serializer.data), 200, "User updated").build()
 
         return ApiResponse(serializer.errors, 400, "Validation error").build()
@@ -130,44 +370,123 @@ class DeleteUser(APIView):
         if not user:
             return ApiResponse(None, 404, "User not found").build()
 
-        user.user_deleted = 1
-        user.save()
+        # end the sessions with the user, so neither the session lookup nor
+        # RefreshToken accepts their tokens once the store forgets them
+        with transaction.atomic():
+            user.user_deleted = 1
+            user.save()
+            UserLoginInfo.objects.filter(user=user, is_active=True).update(is_active=False)
+
+        get_session_store().revoke_user(user.user_id)
 
         return ApiResponse(None, 200, "User deleted successfully").build()
 
 
-class Login(APIView):
+class Login(AsyncAPIView):
+    public = True
 
-    def post(self, request):
+    async def post(self, request):
 
         username = request.data.get("user_name")
         password = request.data.get("user_password")
 
-        user = UserInfo.objects.filter(user_name=username).first()
+        # before the user lookup and bcrypt, so floods stay cheap
+        retry_after = await check_rate(request, "login", username)
+        if retry_after:
+            return throttled_response(retry_after)
+
+        user = await UserInfo.objects.filter(user_name=username).afirst()
 
         if not user:
             return ApiResponse(None, 401, "Invalid user").build()
 
-        if not bcrypt.checkpw(password.encode(), user.user_password.encode()):
-            return ApiResponse(None, 401, "Wrong password").build()
-
-        expiry = timezone.now() + timedelta(hours=settings.TOKEN_EXPIRY_HOURS)
+        try:
+            matched = await get_hashing_pool().checkpw(password.encode(), user.user_password.encode())
+        except HashingPoolFull:
+            return busy_response()
 
-        payload = {
-            "user_name": user.user_name,
-            "exp": expiry
-        }
+        if not matched:
+            return ApiResponse(None, 401, "Wrong password").build()
 
-        token = jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+        token = access_token(user.user_name)
+        login_session_id = secrets.token_hex(32)
+        refresh, refresh_digest = refresh_token(login_session_id)
 
-        UserLoginInfo.objects.create(
+        await UserLoginInfo.objects.acreate(
             user=user,
-            login_session_id=secrets.token_hex(32),
-            jwt_token=token,
-            expires_at=expiry
+            login_session_id=login_session_id,
+            token_digest=token_digest(token),
+            refresh_digest=refresh_digest,
+            expires_at=timezone.now() + timedelta(hours=settings.REFRESH_TOKEN_EXPIRY_HOURS)
+        )
+
+        return ApiResponse(token_pair(token, refresh), 200, "Login successful").build()
+
+
+def token_pair(token, refresh):
+    return {
+        "token": token,
+        "refresh_token": refresh,
+        "expires_in": settings.ACCESS_TOKEN_EXPIRY_MINUTES * 60,
+    }
+
+
+class RefreshToken(AsyncAPIView):
+    """
+    Trade a refresh token for a new access token and a new refresh token,
+    without the password: one indexed lookup of the session row, which is
+    then updated in place. The old tokens stop working. Presenting a refresh
+    token that was already rotated away ends the session, since either the
+    client or someone who copied the token is replaying it.
+    """
+
+    public = True
+
+    async def post(self, request):
+        parts = split_refresh_token(str(request.data.get("refresh_token") or ""))
+        if parts is None:
+            return ApiResponse(None, 401, "Invalid refresh token").build()
+        login_session_id, digest = parts
+
+        loginInfo = await (UserLoginInfo.objects.select_related("user")
+                           .filter(login_session_id=login_session_id, is_active=True).afirst())
+
+        if not loginInfo or not loginInfo.refresh_digest:
+            return ApiResponse(None, 401, "Invalid refresh token").build()
+
+        if not hmac.compare_digest(digest, loginInfo.refresh_digest):
+            if loginInfo.previous_refresh_digest and hmac.compare_digest(digest, loginInfo.previous_refresh_digest):
+                await self.end_session(loginInfo)
+                return ApiResponse(None, 401, "Refresh token reused, session revoked").build()
+            return ApiResponse(None, 401, "Invalid refresh token").build()
+
+        if expired(loginInfo):
+            await self.end_session(loginInfo)
+            return ApiResponse(None, 401, "Session expired").build()
+
+        token = access_token(loginInfo.user.user_name)
+        refresh, refresh_digest = refresh_token(login_session_id)
+
+        # conditional on the digest we checked: of two concurrent refreshes
+        # with the same token only one rotates
+        updated = await UserLoginInfo.objects.filter(
+            pk=loginInfo.pk, refresh_digest=digest, is_active=True
+        ).aupdate(
+            token_digest=token_digest(token),
+            refresh_digest=refresh_digest,
+            previous_refresh_digest=digest,
         )
+        if not updated:
+            return ApiResponse(None, 401, "Refresh token already used").build()
 
-        return ApiResponse({"token": token}, 200, "Login successful").build()
+        await get_session_store().arevoke(loginInfo.token_digest)
+
+        return ApiResponse(token_pair(token, refresh), 200, "Token refreshed").build()
+
+    async def end_session(self, loginInfo):
+        loginInfo.is_active = False
+        await loginInfo.asave(update_fields=["is_active"])
+        await get_session_store().arevoke(loginInfo.token_digest)
 
 
 class Logout(APIView):
@@ -177,9 +496,9 @@ class Logout(APIView):
         if not ok:
             return resp
 
-        token = request.headers.get("Authorization")
+        digest = getattr(request, "token_digest", None) or token_digest(bearer(request.headers["Authorization"]))
 
-        loginInfo = UserLoginInfo.objects.filter(jwt_token=token,user__user_name=username,is_active=True).first()
+        loginInfo = UserLoginInfo.objects.filter(token_digest=digest,user__user_name=username,is_active=True).first()
 
         if not loginInfo:
             return ApiResponse(None, 401, "Already logged out").build()
@@ -187,36 +506,9 @@ class Logout(APIView):
         loginInfo.is_active = False
         loginInfo.save()
 
-        return ApiResponse(None, 200, "Logged out successfully").build()
-
-
-class UserInfoView(APIView):
+        get_session_store().revoke(digest)
 
-    def get(self, request):
-        ok, resp = verify_token(request)
-        if not ok:
-            return resp
-
-        data = list(
-            AllUserInfo_View.objects.values(
-                "user_id",
-                "user_name",
-                "user_email",
-                "user_date_of_creation",
-                "user_last_passcode_update",
-                "user_active",
-                "user_deleted",
-                "user_role",
-                "login_session_id",
-                "login_date_time",
-                "jwt_token",
-                "login_is_active",
-                "created_at",
-                "expires_at",
-            )
-        )
-
-        return ApiResponse(data, 200, "User info view fetched").build()
+        return ApiResponse(None, 200, "Logged out successfully").build()
 
 
 class RegisterTeam(APIView):
@@ -245,9 +537,13 @@ class RegisterTeamMates(APIView):
         
     def post(self , request , team_name):    
         try:
-            team = TeamInfo.objects.get(team_name = team_name)
+            team = TeamInfo.objects.get(team_name = team_name, team_deleted = 0)
         except TeamInfo.DoesNotExist:
             return ApiResponse(None , 400 , "Team not found").build()
+
+        # batch mode: [{"user": ..., "team_user_team_role": ...}, ...] or {"members": [...]}
+        if isinstance(request.data, list) or "members" in request.data:
+            return self.post_batch(request, team)
         
         data = request.data.copy()
         Serializer = TeamUsersSerializer(data = data)
@@ -256,14 +552,79 @@ class RegisterTeamMates(APIView):
             Serializer.save()
             return ApiResponse(None, 201, "Team created successfully").build()
         return ApiResponse(Serializer.errors , 400 , "Validation Error").build()
-        
-        
-class GetTeamInfo(APIView):
 
-    def get(self , request):
-        ok, resp = verify_token(request)
-        if not ok:
-            return resp
-        data = list(AllTeamInfo_View.objects.all().values())
+    def post_batch(self, request, team):
+        try:
+            rows = batch_rows(request.data, "members")
+        except BulkError as exc:
+            return ApiResponse(None, 400, str(exc)).build()
+
+        results, valid = validate_members(team, rows)
+
+        if valid:
+            try:
+                create_members(team, valid)
+            except IntegrityError:
+                return ApiResponse(None, 409, "Conflicting members registered concurrently, retry").build()
+            for index, data in valid:
+                results[index] = {"index": index, "status": "created", "user": str(data["user"])}
+            bump("teams")
+            schedule_refresh()
+
+        code = bulk_status(results, len(valid))
+        return ApiResponse(results, code, f"{len(valid)} of {len(rows)} members registered").build()
+
+
+class GetUsers(ListView):
+    pagination = KeysetPagination(("user_date_of_creation", "user_id"))
+    cache_scopes = ("users",)
+    allowed_fields = USER_FIELDS
+    message = "Users fetched successfully"
+
+    def get_rows(self, request):
+        return UserInfo.objects.filter(user_deleted=0)
+
+    def get_columns(self, fields):
+        return UserInfoRowSerializer.plan(fields)[0]
+
+    def serialize(self, rows, fields):
+        return UserInfoRowSerializer.serialize(rows, fields)
+
+
+class UserInfoView(ListView):
+    # one row per login (or per user with ?latest=1), so the session id
+    # breaks ties between a user's rows
+    pagination = KeysetPagination(("user_date_of_creation", "user_id", "session_key"))
+    cache_scopes = ("users", "logins")
+    allowed_fields = USER_INFO_VIEW_FIELDS
+    message = "User info view fetched"
+
+    def get_rows(self, request):
+        latest = request.query_params.get("latest", "").lower() in ("1", "true", "yes")
+        return user_info_rows(latest=latest)
+
+
+class GetTeamInfo(ListView):
+    # a member who left and rejoined has a row per membership
+    pagination = KeysetPagination(("team_key", "user_id", "team_user_key"))
+    cache_scopes = ("teams", "users")
+    allowed_fields = TEAM_INFO_VIEW_FIELDS
+    message = "Team info view fetched"
+
+    def get_rows(self, request):
+        return team_info_rows()
+
+
+# the same endpoints on the event loop; api.urls serves these unless
+# API_ASYNC_VIEWS is off
+
+class AsyncGetUsers(AsyncListView, GetUsers):
+    pass
+
+
+class AsyncUserInfoView(AsyncListView, UserInfoView):
+    pass
+
 
-        return ApiResponse(data, 200, "Team info view fetched").build()
\ No newline at end of file
+class AsyncGetTeamInfo(AsyncListView, GetTeamInfo):
+    pass
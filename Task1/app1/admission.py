@@ -0,0 +1,163 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+from django.conf import settings
+
+from app1 import instrumentation
+
+BUSY_BODY = json.dumps(
+    {"meta": {"code": 503, "message": "Server busy, try again shortly"}, "data": None}
+).encode()
+
+
+class Gate:
+    """
+    At most ``limit`` requests in flight; up to ``max_queue`` more wait in
+    FIFO order until a slot frees or ``acquire``'s deadline passes.
+
+    With ``target_p99_ms`` the limit adapts (AIMD) between ``min_limit`` and
+    ``max_limit``: every ``window`` completed requests, a p99 above target
+    cuts it by ``decrease``, otherwise it grows by one if the gate was full
+    during the window. Event loop only, so no locking.
+    """
+
+    def __init__(self, name, limit, max_queue, target_p99_ms=None, min_limit=1, window=50, decrease=0.9):
+        self.name = name
+        self.limit = self.max_limit = limit
+        self.min_limit = min(min_limit, limit)
+        self.max_queue = max_queue
+        self.target = target_p99_ms / 1000 if target_p99_ms else None
+        self.window = window
+        self.decrease = decrease
+        self.in_flight = 0
+        self.waiters = deque()
+        self.samples = []
+        self.saturated = False
+
+    async def acquire(self, deadline):
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            return True
+
+        self.saturated = True
+        if len(self.waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.abandon(waiter)
+            return False
+        except asyncio.CancelledError:
+            # client gone or server shutting down while queued
+            self.abandon(waiter)
+            raise
+        return True
+
+    def abandon(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            # granted just as the wait ended: hand the slot back
+            self.release(None)
+        else:
+            waiter.cancel()
+            self.waiters.remove(waiter)
+
+    def release(self, latency):
+        self.in_flight -= 1
+        if latency is not None and self.target is not None:
+            self.samples.append(latency)
+            if len(self.samples) >= self.window:
+                self.adapt()
+        while self.waiters and self.in_flight < self.limit:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+
+    def adapt(self):
+        self.samples.sort()
+        p99 = self.samples[min(len(self.samples) - 1, int(len(self.samples) * 0.99))]
+        if p99 > self.target:
+            self.limit = max(self.min_limit, math.floor(self.limit * self.decrease))
+        elif self.saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.samples.clear()
+        self.saturated = False
+
+
+class AdmissionController:
+    """
+    ASGI middleware in front of the Django application (Task1.asgi), so
+    requests are admitted or shed before any Django code, AuthMiddleware
+    included, runs for them.
+
+    Each HTTP request is classified (ADMISSION_CLASSES: bcrypt writes by
+    path, NDJSON exports, everything else a read) and must get a slot in its
+    class's gate and in the worker-wide gate (ADMISSION_MAX_IN_FLIGHT). A
+    request that cannot get both within ADMISSION_QUEUE_TIMEOUT_SECONDS is
+    answered with 503 and Retry-After instead of queueing inside the server.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.timeout = settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        self.retry_after = str(max(1, math.ceil(self.timeout)))
+        self.gates = {name: Gate(name, **options) for name, options in settings.ADMISSION_CLASSES.items()}
+        self.worker = Gate("worker", settings.ADMISSION_MAX_IN_FLIGHT, settings.ADMISSION_MAX_QUEUE)
+        self.write_paths = tuple(settings.ADMISSION_WRITE_PATHS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.application(scope, receive, send)
+
+        gate = self.gates[self.classify(scope)]
+        deadline = time.monotonic() + self.timeout
+        if not await gate.acquire(deadline):
+            return await self.reject(gate, send)
+        if not await self.worker.acquire(deadline):
+            gate.release(None)
+            return await self.reject(gate, send)
+
+        instrumentation.count_admission(gate.name, "admitted")
+        start = time.monotonic()
+        try:
+            return await self.application(scope, receive, send)
+        finally:
+            latency = time.monotonic() - start
+            self.worker.release(None)
+            gate.release(latency)
+
+    def classify(self, scope):
+        if scope["path"].startswith(self.write_paths):
+            return "write"
+        if b"format=ndjson" in scope.get("query_string", b""):
+            return "export"
+        for name, value in scope.get("headers", ()):
+            if name == b"accept" and b"application/x-ndjson" in value:
+                return "export"
+        return "read"
+
+    async def reject(self, gate, send):
+        instrumentation.count_admission(gate.name, "rejected")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(BUSY_BODY)).encode()),
+                (b"retry-after", self.retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": BUSY_BODY})
+
+
+def admission_controlled(application):
+    """``application`` behind an AdmissionController, unless ADMISSION_CONTROL is off."""
+    if not settings.ADMISSION_CONTROL:
+        return application
+    return AdmissionController(application)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class App1Config(AppConfig):
     name = 'app1'
+
+    def ready(self):
+        from app1 import signals  # noqa: F401
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from app1.models import UserInfo, UserLoginInfo, TeamInfo, TeamUsers
+
+# which version each model's writes bump
+MODEL_SCOPES = {
+    UserInfo: "users",
+    UserLoginInfo: "logins",
+    TeamInfo: "teams",
+    TeamUsers: "teams",
+}
+
+ALL_SCOPES = ("users", "logins", "teams")
+
+
+def _cache():
+    return caches[settings.API_RESPONSE_CACHE_ALIAS]
+
+
+def _key(scope):
+    return f"api:version:{scope}"
+
+
+def bump(*scopes):
+    """Mark the data behind ``scopes`` as changed; cached pages built on it go stale."""
+    # the version is the time of the last write (api.response_cache checks it
+    # against replication lag); a missing one is created as "just written"
+    _cache().set_many({_key(scope): time.time_ns() for scope in scopes}, timeout=None)
+
+
+async def abump(*scopes):
+    await _cache().aset_many({_key(scope): time.time_ns() for scope in scopes}, timeout=None)
+
+
+def versions(scopes):
+    """Current version of each scope, in order, in one cache round trip."""
+    cache = _cache()
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+async def aversions(scopes):
+    """``versions`` through the cache's async API, for async views."""
+    cache = _cache()
+    keys = [_key(scope) for scope in scopes]
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            found[key] = await cache.aget(key)
+    return tuple(found[key] for key in keys)
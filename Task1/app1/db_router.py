@@ -0,0 +1,124 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from app1.session_cache import LRUTTLCache, token_digest
+
+STICKY_COOKIE = "primary_until"
+
+_state = ContextVar("db_routing_state", default=None)
+
+# token digest -> True while the client is pinned to the primary; covers
+# clients that drop cookies, within this process
+_sticky_clients = LRUTTLCache(max_entries=10000, ttl_seconds=settings.REPLICA_STICKY_SECONDS)
+
+
+class RoutingState:
+    """Per-request routing flags, shared by reference with ORM worker threads."""
+
+    def __init__(self, sticky=False):
+        self.sticky = sticky
+        self.replica = False
+        self.wrote = False
+
+
+def use_replica():
+    """Send this request's reads to a replica, unless it is pinned to the primary."""
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+class ReplicaRouter:
+    """
+    Reads go to one of DATABASE_REPLICAS only when the request opted in with
+    use_replica() (the list endpoints) and has not written recently;
+    everything else, writes included, uses ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and state is not None and state.replica and not state.sticky and not state.wrote:
+            return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks writes per request. A client that wrote is pinned to the primary
+    for REPLICA_STICKY_SECONDS (cookie plus an in-process map keyed by its
+    token), so it reads its own writes despite replication lag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, state, response)
+
+    def start(self, request):
+        sticky = False
+        try:
+            sticky = float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            pass
+        client = _client_key(request)
+        if not sticky and client is not None:
+            sticky = _sticky_clients.get(client) is not None
+
+        state = RoutingState(sticky=sticky)
+        return state, _state.set(state)
+
+    def finish(self, request, state, response):
+        window = settings.REPLICA_STICKY_SECONDS
+        if state.wrote and settings.DATABASE_REPLICAS and window > 0:
+            until = time.time() + window
+            response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=window, httponly=True, samesite="Lax")
+            client = _client_key(request)
+            if client is not None:
+                _sticky_clients.set(client, True, expires_at=until)
+        return response
+
+
+def _client_key(request):
+    token = request.headers.get("Authorization")
+    return token_digest(token) if token else None
@@ -0,0 +1,244 @@
+import bisect
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# metrics of the request being handled, None when it is not sampled (or the
+# instrumentation is off); ORM threads of sync_to_async see the same object
+_current = ContextVar("request_metrics", default=None)
+
+# seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    """Where one request spent its time: ``timings`` per part, plus its queries."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.queries = 0
+        self.statements = Counter()
+
+    def add(self, name, seconds):
+        self.timings[name] += seconds
+
+    def query(self, sql, seconds):
+        self.timings["db"] += seconds
+        self.queries += 1
+        self.statements[sql] += 1
+
+    def duplicates(self):
+        """Queries that repeated an earlier statement of this request (N+1)."""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+
+def current():
+    return _current.get()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+class measure:
+    """
+    ``with measure("serialize"):`` adds the block's duration to the current
+    request's metrics; a no-op outside a sampled request.
+    """
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, name):
+        self.metrics = _current.get()
+        self.name = name
+
+    def __enter__(self):
+        if self.metrics is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.metrics is not None:
+            self.metrics.add(self.name, time.perf_counter() - self.start)
+
+
+def timed_call(metrics, name, func, *args):
+    """Run ``func(*args)`` and add its duration to ``metrics`` (for other threads)."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.query(sql, time.perf_counter() - start)
+
+
+def _add_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def record_queries():
+    """Time the queries of every connection opened from now on (and the open ones)."""
+    connection_created.connect(_add_query_recorder, dispatch_uid="app1.instrumentation")
+    for connection in connections.all(initialized_only=True):
+        _add_query_recorder(None, connection)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.series = defaultdict(int)
+
+    def inc(self, labels, value=1):
+        self.series[labels] += value
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_labels(label_names, labels)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Registry:
+    """
+    Histograms of the sampled requests of this process, labelled by view and
+    method. Each server process keeps its own; scrape every worker.
+    """
+
+    label_names = ("view", "method")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request = Histogram("api_request_duration_seconds", "Wall time of the request.", DURATION_BUCKETS)
+        self.parts = {
+            name: Histogram(f"api_{name}_duration_seconds", f"Time spent in {name} per request.", DURATION_BUCKETS)
+            for name in ("db", "bcrypt", "serialize")
+        }
+        self.queries = Histogram("api_db_queries", "Queries per request.", QUERY_BUCKETS)
+        self.duplicates = CounterMetric("api_db_duplicate_queries_total", "Queries repeating an earlier statement of the same request.")
+        # every request, sampled or not
+        self.rate_limits = CounterMetric("api_rate_limit_decisions_total", "Rate limiter decisions (api.throttling).")
+        self.admissions = CounterMetric("api_admission_decisions_total", "Admission controller decisions (app1.admission).")
+
+    def observe(self, labels, wall, metrics):
+        with self._lock:
+            self.request.observe(labels, wall)
+            for name, histogram in self.parts.items():
+                if name in metrics.timings:
+                    histogram.observe(labels, metrics.timings[name])
+            self.queries.observe(labels, metrics.queries)
+            duplicates = metrics.duplicates()
+            if duplicates:
+                self.duplicates.inc(labels, duplicates)
+
+    def rate_limit(self, scope, kind, allowed):
+        with self._lock:
+            self.rate_limits.inc((scope, kind, "allowed" if allowed else "limited"))
+
+    def admission(self, gate, result):
+        with self._lock:
+            self.admissions.inc((gate, result))
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.request, *self.parts.values(), self.queries, self.duplicates):
+                lines.extend(metric.render(self.label_names))
+            lines.extend(self.rate_limits.render(("scope", "key", "result")))
+            lines.extend(self.admissions.render(("class", "result")))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def count_rate_limit(scope, kind, allowed):
+    if settings.INSTRUMENTATION_ENABLED:
+        registry.rate_limit(scope, kind, allowed)
+
+
+def count_admission(gate, result):
+    if settings.INSTRUMENTATION_ENABLED:
+        registry.admission(gate, result)
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    view_class = getattr(match.func, "cls", None) or getattr(match.func, "view_class", None)
+    return view_class.__name__ if view_class is not None else match.view_name
+
+
+def server_timing(wall, metrics):
+    entries = [f"app;dur={wall * 1000:.1f}"]
+    for name, seconds in metrics.timings.items():
+        desc = f';desc="{metrics.queries} queries"' if name == "db" else ""
+        entries.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+    duplicates = metrics.duplicates()
+    if duplicates:
+        entries.append(f'dup;desc="{duplicates} duplicate queries"')
+    return ", ".join(entries)
+
+
+def report_duplicates(view, metrics, threshold):
+    for sql, count in metrics.statements.items():
+        if count >= threshold:
+            logger.warning("%s ran the same query %d times (N+1?): %s", view, count, sql[:300])
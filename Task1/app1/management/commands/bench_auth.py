@@ -0,0 +1,61 @@
+import secrets
+import time
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+
+from app1 import tokens
+from app1.session_cache import token_digest
+from api.views import verify_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-request token verification cost: the old double jwt.decode (middleware + "
+        "verify_token) vs one memoized verification shared with the view."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        n = options["iterations"]
+        token = jwt.encode(
+            {"user_name": "bench", "exp": timezone.now() + timedelta(hours=1), "jti": secrets.token_urlsafe(16)},
+            settings.SECRET_KEY, algorithm="HS256",
+        )
+        request = RequestFactory().get("/api/get_users", HTTP_AUTHORIZATION=token)
+
+        def authenticate():
+            # what AuthMiddleware.check_token and the view's verify_token now do
+            request.auth_claims = None
+            request.token_digest, request.auth_claims = tokens.verify(tokens.bearer(request.headers["Authorization"]))
+            verify_token(request)
+
+        def before():
+            # AuthMiddleware and verify_token each decoded, plus the session digest
+            jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+            token_digest(token)
+            jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+
+        def after_cold():
+            tokens._verified().clear()
+            authenticate()
+
+        def after_warm():
+            authenticate()
+
+        results = {}
+        for name, func in (("before", before), ("after, memo miss", after_cold), ("after, memo hit", after_warm)):
+            func()
+            start = time.perf_counter()
+            for _ in range(n):
+                func()
+            results[name] = (time.perf_counter() - start) / n * 1e6
+            self.stdout.write(f"{name:<18} {results[name]:>8.2f} us/request")
+
+        self.stdout.write(f"speedup with memo hit: {results['before'] / results['after, memo hit']:.1f}x")
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app1.retention import convert_to_partitioned, is_partitioned, maintain_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the monthly partitions of the login table: create the upcoming "
+        "months and drop the ones past retention. --convert turns the plain table "
+        "into a partitioned one first (locks the table while rows are copied)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert", action="store_true",
+            help="Rebuild the login table as a partitioned table.",
+        )
+        parser.add_argument(
+            "--months-ahead", type=int, default=settings.SESSION_PARTITION_MONTHS_AHEAD,
+            help="Months of partitions to create ahead of now.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning needs PostgreSQL")
+
+        if options["convert"]:
+            if is_partitioned():
+                raise CommandError("The login table is already partitioned")
+            convert_to_partitioned(options["months_ahead"])
+            self.stdout.write(self.style.SUCCESS("Login table converted to monthly partitions"))
+        elif not is_partitioned():
+            raise CommandError("The login table is not partitioned; run with --convert first")
+
+        created, dropped = maintain_partitions(options["months_ahead"])
+        for name in created:
+            self.stdout.write(f"created {name}")
+        for name in dropped:
+            self.stdout.write(f"dropped {name}")
+        self.stdout.write(self.style.SUCCESS("Partitions up to date"))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app1.retention import purge_expired_sessions, sweep_forever
+
+
+class Command(BaseCommand):
+    help = "Delete login sessions that expired more than the retention period ago, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-hours", type=int, default=settings.SESSION_RETENTION_HOURS,
+            help="Keep sessions that expired less than this many hours ago.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.SESSION_PURGE_BATCH_SIZE,
+            help="Rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.0,
+            help="Seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--forever", action="store_true",
+            help="Run the session sweeper in the foreground every SESSION_SWEEP_INTERVAL_SECONDS with the "
+                 "settings' retention, for servers not started through gunicorn.conf.py.",
+        )
+
+    def handle(self, *args, **options):
+        if options["forever"]:
+            if settings.SESSION_SWEEP_INTERVAL_SECONDS <= 0:
+                raise CommandError("SESSION_SWEEP_INTERVAL_SECONDS is 0, the sweeper is disabled")
+            sweep_forever(settings.SESSION_SWEEP_INTERVAL_SECONDS)
+            return
+
+        deleted = purge_expired_sessions(
+            retention=timedelta(hours=options["retention_hours"]),
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions"))
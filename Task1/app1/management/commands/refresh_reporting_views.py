@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app1.reporting import MATERIALIZED_VIEWS, refresh_materialized_views
+
+
+class Command(BaseCommand):
+    help = "Refresh the materialized reporting views (" + ", ".join(MATERIALIZED_VIEWS) + ")."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--blocking", action="store_true",
+            help="Plain REFRESH instead of CONCURRENTLY (faster, but blocks readers).",
+        )
+
+    def handle(self, *args, **options):
+        refresh_materialized_views(concurrently=not options["blocking"])
+        self.stdout.write(self.style.SUCCESS("Reporting views refreshed"))
@@ -1,9 +1,23 @@
+import functools
+import hmac
+import ipaddress
+import random
+import time
+
 import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, JsonResponse
+from django.urls import URLResolver, get_resolver
 from django.utils import timezone
+from rest_framework.views import APIView
 
+from app1 import instrumentation
 from app1.models import UserLoginInfo
+from app1.session_cache import CachedSession, SessionUser
+from app1.session_store import get_session_store
+from app1.tokens import bearer, verify
 
 
 class AuthMiddleware:
@@ -13,75 +27,251 @@ class AuthMiddleware:
     Public:
         /
         /admin/*
-        /api/login
-        /api/create_user
+        API views with ``public = True`` (/api/login, /api/create_user)
 
     Protected:
-        everything else under /api/*
+        every other DRF view, i.e. everything else under /api/*
+
+    The protected views are collected once from the URLconf (see
+    protected_views) and checked in process_view, after URL resolution, with
+    a set lookup on the resolved view.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        # under ASGI the chain below is async: run on the event loop too
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django picks process_view up after __init__; a coroutine here
+            # avoids a thread hop per request
+            self.process_view = self.aprocess_view
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
 
-        path = request.path
+    async def __acall__(self, request):
+        return await self.get_response(request)
 
-        # =========================
-        # ✅ PUBLIC ROUTES
-        # =========================
-        public_routes = [
-            "/",                      # homepage
-            "/admin",                 # admin panel
-            "/api/login",
-            "/api/create_user",
-        ]
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_func not in protected_views():
+            return None
 
-        # allow public routes
-        if any(path.startswith(route) for route in public_routes):
-            return self.get_response(request)
+        digest, error = self.check_token(request)
+        if error is not None:
+            return error
 
-        # =========================
-        # ✅ ONLY PROTECT /api/*
-        # =========================
-        if not path.startswith("/api/"):
-            return self.get_response(request)
+        # check session store before touching the database
+        store = get_session_store()
+        session = store.get(digest)
+
+        if session is not None:
+            request.auth_session = session
+            request.user = SessionUser.of(session)
+            return None
+
+        # check loginInfo
+        try:
+            loginInfo = UserLoginInfo.objects.select_related("user").get(token_digest=digest,is_active=True)
+        except UserLoginInfo.DoesNotExist:
+            return JsonResponse({"error": "Session inactive"}, status=401)
+
+        if loginInfo.user.user_deleted:
+            return JsonResponse({"error": "Session inactive"}, status=401)
+
+        # expiry check
+        if expired(loginInfo):
+            loginInfo.is_active = False
+            loginInfo.save()
+            return JsonResponse({"error": "loginInfo expired"}, status=401)
+
+        request.auth_session = cached_session(loginInfo)
+        store.set(digest, request.auth_session)
+
+        request.user = SessionUser.of(request.auth_session)
+
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if view_func not in protected_views():
+            return None
+
+        digest, error = self.check_token(request)
+        if error is not None:
+            return error
+
+        store = get_session_store()
+        session = await store.aget(digest)
+
+        if session is not None:
+            request.auth_session = session
+            request.user = SessionUser.of(session)
+            return None
+
+        try:
+            loginInfo = await UserLoginInfo.objects.select_related("user").aget(token_digest=digest,is_active=True)
+        except UserLoginInfo.DoesNotExist:
+            return JsonResponse({"error": "Session inactive"}, status=401)
+
+        if loginInfo.user.user_deleted:
+            return JsonResponse({"error": "Session inactive"}, status=401)
+
+        if expired(loginInfo):
+            loginInfo.is_active = False
+            await loginInfo.asave()
+            return JsonResponse({"error": "loginInfo expired"}, status=401)
 
+        request.auth_session = cached_session(loginInfo)
+        await store.aset(digest, request.auth_session)
+
+        request.user = SessionUser.of(request.auth_session)
+
+        return None
+
+    def check_token(self, request):
+        """
+        ``(digest, None)`` for a valid JWT, ``(None, response)`` to reject the
+        request. Pure CPU, shared by the sync and async paths.
+        """
         # =========================
         # 🔐 TOKEN REQUIRED BELOW
         # =========================
         token = request.headers.get("Authorization")
 
         if not token:
-            return JsonResponse({"error": "Token missing"}, status=401)
+            return None, JsonResponse({"error": "Token missing"}, status=401)
 
-        if token.startswith("Bearer "):
-            token = token.split(" ")[1]
-
-        # verify jwt
+        # verify jwt (memoized, see app1.tokens)
         try:
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"]
-            )
+            digest, claims = verify(bearer(token))
         except jwt.ExpiredSignatureError:
-            return JsonResponse({"error": "Token expired"}, status=401)
+            return None, JsonResponse({"error": "Token expired"}, status=401)
         except jwt.InvalidTokenError:
-            return JsonResponse({"error": "Invalid token"}, status=401)
+            return None, JsonResponse({"error": "Invalid token"}, status=401)
 
-        # check loginInfo
+        # views reuse these instead of decoding the token again
+        request.auth_claims = claims
+        request.token_digest = digest
+        return digest, None
+
+
+@functools.cache
+def protected_views():
+    """
+    The resolved view callables that need a token: every DRF view in the
+    URLconf whose class is not marked ``public = True``. Built on first use,
+    once the URLconf can be imported.
+    """
+    protected = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            view_class = getattr(pattern.callback, "cls", None)
+            if view_class is not None and issubclass(view_class, APIView) and not getattr(view_class, "public", False):
+                protected.add(pattern.callback)
+
+    walk(get_resolver().url_patterns)
+    return frozenset(protected)
+
+
+class InstrumentationMiddleware:
+    """
+    Opt-in profiling (INSTRUMENTATION_ENABLED). For a sample of requests it
+    records wall time, DB time and query count, repeated queries (N+1),
+    bcrypt and serialization time per view, returns them in a
+    ``Server-Timing`` header and adds them to the Prometheus histograms
+    served at INSTRUMENTATION_METRICS_PATH, to the allowed addresses or the
+    metrics token only. When disabled it is not loaded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        self.metrics_path = settings.INSTRUMENTATION_METRICS_PATH
+        self.metrics_networks = [
+            ipaddress.ip_network(network, strict=False) for network in settings.INSTRUMENTATION_METRICS_ALLOWED_IPS
+        ]
+        self.metrics_token = settings.INSTRUMENTATION_METRICS_TOKEN
+        instrumentation.record_queries()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if request.path == self.metrics_path and self.may_read_metrics(request):
+            return self.metrics()
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics, token = instrumentation.start_request()
         try:
-            loginInfo = UserLoginInfo.objects.get(jwt_token=token,is_active=True)
-        except UserLoginInfo.DoesNotExist:
-            return JsonResponse({"error": "Session inactive"}, status=401)
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, metrics)
 
-        # expiry check
-        if loginInfo.expires_at and loginInfo.expires_at < timezone.now():
-            loginInfo.is_active = False
-            loginInfo.save()
-            return JsonResponse({"error": "loginInfo expired"}, status=401)
+    async def __acall__(self, request):
+        if request.path == self.metrics_path and self.may_read_metrics(request):
+            return self.metrics()
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        metrics, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        wall = time.perf_counter() - metrics.start
+        view = instrumentation.view_name(request)
+        instrumentation.registry.observe((view, request.method), wall, metrics)
+        instrumentation.report_duplicates(view, metrics, settings.INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response["Server-Timing"] = instrumentation.server_timing(wall, metrics)
+        return response
+
+    def may_read_metrics(self, request):
+        if self.metrics_token:
+            token = bearer(request.headers.get("Authorization", ""))
+            if hmac.compare_digest(token.encode(), self.metrics_token.encode()):
+                return True
+        try:
+            client = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+        except ValueError:
+            return False
+        return any(client in network for network in self.metrics_networks)
+
+    def metrics(self):
+        return HttpResponse(instrumentation.registry.render(), content_type="text/plain; version=0.0.4")
+
+
+def expired(loginInfo):
+    return loginInfo.expires_at and loginInfo.expires_at < timezone.now()
 
-        request.user = loginInfo.user
 
-        return self.get_response(request)
\ No newline at end of file
+def cached_session(loginInfo):
+    expires_at = loginInfo.expires_at.timestamp() if loginInfo.expires_at else None
+    return CachedSession(
+        session_pk=loginInfo.pk,
+        user_id=str(loginInfo.user_id),
+        user_name=loginInfo.user.user_name,
+        expires_at=expires_at,
+    )
@@ -0,0 +1,209 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+USER_INFO_COLUMNS = """
+    ui.user_id,
+    ui.user_name,
+    ui.user_email,
+    ui.user_date_of_creation,
+    ui.user_last_passcode_update,
+    ui.user_active,
+    ui.user_deleted,
+    ui.user_role,
+    ui.user_photo_path,
+    ui.user_photo_link,
+    ui.user_fullname,
+
+    li.login_session_id,
+    li.login_date_time,
+    li.jwt_token,
+    li.is_active AS login_is_active,
+    li.created_at,
+    li.expires_at,
+
+    COALESCE(li.login_session_id, '') AS session_key
+"""
+
+
+VIEW_SQL = f"""
+CREATE MATERIALIZED VIEW alluserinfo_mview AS
+
+SELECT {USER_INFO_COLUMNS}
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_userlogininfo li
+    ON li.user_id = ui.user_id;
+
+CREATE UNIQUE INDEX alluserinfo_mview_key ON alluserinfo_mview (user_id, session_key);
+CREATE INDEX alluserinfo_mview_page ON alluserinfo_mview (user_date_of_creation, user_id, session_key);
+
+
+CREATE OR REPLACE VIEW latestuserinfo_view AS
+
+SELECT DISTINCT ON (ui.user_id) {USER_INFO_COLUMNS}
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_userlogininfo li
+    ON li.user_id = ui.user_id
+
+ORDER BY ui.user_id, li.login_date_time DESC NULLS LAST;
+
+
+CREATE MATERIALIZED VIEW latestuserinfo_mview AS
+
+SELECT * FROM latestuserinfo_view;
+
+CREATE UNIQUE INDEX latestuserinfo_mview_key ON latestuserinfo_mview (user_id);
+CREATE INDEX latestuserinfo_mview_page ON latestuserinfo_mview (user_date_of_creation, user_id, session_key);
+
+
+CREATE MATERIALIZED VIEW allteaminfo_mview AS
+
+SELECT
+
+    ui.user_id,
+
+    ti.team_id,
+    ti.team_name,
+    ti.team_created_by,
+    ti.team_created_datetime,
+    ti.team_deleted,
+
+    tu.team_user_team_role,
+    tu.team_user_date_of_creation,
+    tu.team_user_active,
+    tu.team_user_deleted,
+
+    COALESCE(ti.team_id, '') AS team_key,
+    COALESCE(tu.id, 0) AS team_user_key
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_teamusers tu
+    ON tu.user_id = ui.user_id
+
+LEFT JOIN app1_teaminfo ti
+    ON ti.team_id = tu.team_id;
+
+CREATE UNIQUE INDEX allteaminfo_mview_key ON allteaminfo_mview (user_id, team_user_key);
+CREATE INDEX allteaminfo_mview_page ON allteaminfo_mview (team_key, user_id);
+"""
+
+
+DROP_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS allteaminfo_mview;
+DROP MATERIALIZED VIEW IF EXISTS latestuserinfo_mview;
+DROP VIEW IF EXISTS latestuserinfo_view;
+DROP MATERIALIZED VIEW IF EXISTS alluserinfo_mview;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0004_allteaminfo_view_alter_alluserinfo_view_table'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=VIEW_SQL,
+            reverse_sql=DROP_SQL,
+        ),
+        migrations.CreateModel(
+            name='AllTeamInfo_MView',
+            fields=[
+                ('user_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('team_id', models.CharField(max_length=10, null=True)),
+                ('team_name', models.CharField(max_length=15, null=True)),
+                ('team_created_by', models.CharField(max_length=10, null=True)),
+                ('team_created_datetime', models.DateTimeField(null=True)),
+                ('team_deleted', models.PositiveSmallIntegerField(null=True)),
+                ('team_user_team_role', models.PositiveSmallIntegerField(choices=[(1, 'Project Owner'), (2, 'Maintainer'), (3, 'Developer')], null=True)),
+                ('team_user_date_of_creation', models.DateTimeField(null=True)),
+                ('team_user_active', models.PositiveSmallIntegerField(null=True)),
+                ('team_user_deleted', models.PositiveSmallIntegerField(null=True)),
+                ('team_key', models.CharField(max_length=10)),
+                ('team_user_key', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'allteaminfo_mview',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AllUserInfo_MView',
+            fields=[
+                ('user_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('user_name', models.CharField(max_length=20)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('user_date_of_creation', models.DateField()),
+                ('user_last_passcode_update', models.DateField(null=True)),
+                ('user_active', models.PositiveSmallIntegerField(null=True)),
+                ('user_deleted', models.PositiveSmallIntegerField(null=True)),
+                ('user_role', models.PositiveSmallIntegerField(choices=[(1, 'Project Owner'), (2, 'Maintainer'), (3, 'Developer')], null=True)),
+                ('login_session_id', models.CharField(max_length=64, null=True)),
+                ('login_date_time', models.DateTimeField(null=True)),
+                ('jwt_token', models.TextField(null=True)),
+                ('login_is_active', models.BooleanField(null=True)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('expires_at', models.DateTimeField(null=True)),
+                ('session_key', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'alluserinfo_mview',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='LatestUserInfo_MView',
+            fields=[
+                ('user_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('user_name', models.CharField(max_length=20)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('user_date_of_creation', models.DateField()),
+                ('user_last_passcode_update', models.DateField(null=True)),
+                ('user_active', models.PositiveSmallIntegerField(null=True)),
+                ('user_deleted', models.PositiveSmallIntegerField(null=True)),
+                ('user_role', models.PositiveSmallIntegerField(choices=[(1, 'Project Owner'), (2, 'Maintainer'), (3, 'Developer')], null=True)),
+                ('login_session_id', models.CharField(max_length=64, null=True)),
+                ('login_date_time', models.DateTimeField(null=True)),
+                ('jwt_token', models.TextField(null=True)),
+                ('login_is_active', models.BooleanField(null=True)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('expires_at', models.DateTimeField(null=True)),
+                ('session_key', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'latestuserinfo_mview',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='LatestUserInfo_View',
+            fields=[
+                ('user_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('user_name', models.CharField(max_length=20)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('user_date_of_creation', models.DateField()),
+                ('user_last_passcode_update', models.DateField(null=True)),
+                ('user_active', models.PositiveSmallIntegerField(null=True)),
+                ('user_deleted', models.PositiveSmallIntegerField(null=True)),
+                ('user_role', models.PositiveSmallIntegerField(choices=[(1, 'Project Owner'), (2, 'Maintainer'), (3, 'Developer')], null=True)),
+                ('login_session_id', models.CharField(max_length=64, null=True)),
+                ('login_date_time', models.DateTimeField(null=True)),
+                ('jwt_token', models.TextField(null=True)),
+                ('login_is_active', models.BooleanField(null=True)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('expires_at', models.DateTimeField(null=True)),
+                ('session_key', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'latestuserinfo_view',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:31
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0005_reporting_materialized_views'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userinfo',
+            index=models.Index(condition=models.Q(('user_deleted', 0)), fields=['user_date_of_creation', 'user_id'], name='userinfo_active_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlogininfo',
+            index=django.contrib.postgres.indexes.HashIndex(condition=models.Q(('is_active', True)), fields=['jwt_token'], name='userlogininfo_active_token'),
+        ),
+        migrations.AddConstraint(
+            model_name='teaminfo',
+            constraint=models.UniqueConstraint(condition=models.Q(('team_deleted', 0)), fields=('team_name',), name='teaminfo_unique_active_name'),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:05
+
+import hashlib
+
+from django.db import migrations, models
+
+
+DROP_VIEWS_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS latestuserinfo_mview;
+DROP VIEW IF EXISTS latestuserinfo_view;
+DROP MATERIALIZED VIEW IF EXISTS alluserinfo_mview;
+DROP VIEW IF EXISTS alluserinfo_view;
+"""
+
+
+USER_INFO_COLUMNS = """
+    ui.user_id,
+    ui.user_name,
+    ui.user_email,
+    ui.user_date_of_creation,
+    ui.user_last_passcode_update,
+    ui.user_active,
+    ui.user_deleted,
+    ui.user_role,
+    ui.user_photo_path,
+    ui.user_photo_link,
+    ui.user_fullname,
+
+    li.login_session_id,
+    li.login_date_time,
+    li.is_active AS login_is_active,
+    li.created_at,
+    li.expires_at
+"""
+
+
+# same views as 0002 / 0005, without the jwt_token column
+CREATE_VIEWS_SQL = f"""
+CREATE OR REPLACE VIEW alluserinfo_view AS
+
+SELECT
+    ui.user_id,
+    ui.user_name,
+    ui.user_email,
+    ui.user_password,
+    ui.user_date_of_creation,
+    ui.user_last_passcode_update,
+    ui.user_active,
+    ui.user_deleted,
+    ui.user_role,
+    ui.user_photo_path,
+    ui.user_photo_link,
+    ui.user_fullname,
+
+    li.login_session_id,
+    li.login_date_time,
+    li.is_active AS login_is_active,
+    li.created_at,
+    li.expires_at
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_userlogininfo li
+    ON li.user_id = ui.user_id;
+
+
+CREATE MATERIALIZED VIEW alluserinfo_mview AS
+
+SELECT {USER_INFO_COLUMNS},
+    COALESCE(li.login_session_id, '') AS session_key
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_userlogininfo li
+    ON li.user_id = ui.user_id;
+
+CREATE UNIQUE INDEX alluserinfo_mview_key ON alluserinfo_mview (user_id, session_key);
+CREATE INDEX alluserinfo_mview_page ON alluserinfo_mview (user_date_of_creation, user_id, session_key);
+
+
+CREATE OR REPLACE VIEW latestuserinfo_view AS
+
+SELECT DISTINCT ON (ui.user_id) {USER_INFO_COLUMNS},
+    COALESCE(li.login_session_id, '') AS session_key
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_userlogininfo li
+    ON li.user_id = ui.user_id
+
+ORDER BY ui.user_id, li.login_date_time DESC NULLS LAST;
+
+
+CREATE MATERIALIZED VIEW latestuserinfo_mview AS
+
+SELECT * FROM latestuserinfo_view;
+
+CREATE UNIQUE INDEX latestuserinfo_mview_key ON latestuserinfo_mview (user_id);
+CREATE INDEX latestuserinfo_mview_page ON latestuserinfo_mview (user_date_of_creation, user_id, session_key);
+"""
+
+
+def fill_token_digest(apps, schema_editor):
+    UserLoginInfo = apps.get_model("app1", "UserLoginInfo")
+
+    batch = []
+    for login in UserLoginInfo.objects.only("pk", "jwt_token").iterator(chunk_size=2000):
+        login.token_digest = hashlib.sha256(login.jwt_token.encode()).hexdigest()
+        batch.append(login)
+        if len(batch) >= 2000:
+            UserLoginInfo.objects.bulk_update(batch, ["token_digest"])
+            batch = []
+    if batch:
+        UserLoginInfo.objects.bulk_update(batch, ["token_digest"])
+    # the updates leave deferred foreign key checks pending, and PostgreSQL
+    # will not alter a table that has any, so run them before the AlterField
+    schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+    # Irreversible: the raw tokens cannot be recovered from their digests.
+
+    dependencies = [
+        ('app1', '0006_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=DROP_VIEWS_SQL,
+        ),
+        migrations.AddField(
+            model_name='userlogininfo',
+            name='token_digest',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_token_digest),
+        migrations.AlterField(
+            model_name='userlogininfo',
+            name='token_digest',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='userlogininfo',
+            name='userlogininfo_active_token',
+        ),
+        migrations.RemoveField(
+            model_name='userlogininfo',
+            name='jwt_token',
+        ),
+        migrations.RunSQL(
+            sql=CREATE_VIEWS_SQL,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0007_userlogininfo_token_digest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userlogininfo',
+            index=models.Index(fields=['expires_at'], name='userlogininfo_expires_idx'),
+        ),
+    ]
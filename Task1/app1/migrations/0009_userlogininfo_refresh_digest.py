@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0008_userlogininfo_expires_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlogininfo',
+            name='refresh_digest',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='userlogininfo',
+            name='previous_refresh_digest',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+
+
+def retire_duplicate_members(apps, schema_editor):
+    # keep the first active registration of each (team, user); the others
+    # are soft-deleted like a removed member, so nothing is lost
+    TeamUsers = apps.get_model("app1", "TeamUsers")
+    active = TeamUsers.objects.filter(team_user_deleted=0)
+    duplicates = (
+        active.values("team_id", "user_id")
+        .annotate(first=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        (active.filter(team_id=row["team_id"], user_id=row["user_id"])
+         .exclude(id=row["first"]).update(team_user_deleted=1))
+
+
+# A member who left and rejoined has more than one row per (team, user), so
+# the team report pages on the membership id as well.
+VIEW_SQL = """
+CREATE OR REPLACE VIEW AllTeamInfo_View AS
+
+SELECT
+
+    ui.user_id,
+
+    ti.team_id,
+    ti.team_name,
+    ti.team_created_by,
+    ti.team_created_datetime,
+    ti.team_deleted,
+
+
+    tu.team_user_team_role,
+    tu.team_user_date_of_creation,
+    tu.team_user_active,
+    tu.team_user_deleted,
+
+    COALESCE(tu.id, 0) AS team_user_key
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_teamusers tu
+    ON tu.user_id = ui.user_id
+
+LEFT JOIN app1_teaminfo ti
+    ON ti.team_id = tu.team_id;
+
+DROP INDEX allteaminfo_mview_page;
+CREATE INDEX allteaminfo_mview_page ON allteaminfo_mview (team_key, user_id, team_user_key);
+"""
+
+
+REVERSE_SQL = """
+DROP INDEX allteaminfo_mview_page;
+CREATE INDEX allteaminfo_mview_page ON allteaminfo_mview (team_key, user_id);
+
+DROP VIEW AllTeamInfo_View;
+CREATE VIEW AllTeamInfo_View AS
+
+SELECT
+
+    ui.user_id,
+
+    ti.team_id,
+    ti.team_name,
+    ti.team_created_by,
+    ti.team_created_datetime,
+    ti.team_deleted,
+
+
+    tu.team_user_team_role,
+    tu.team_user_date_of_creation,
+    tu.team_user_active,
+    tu.team_user_deleted
+
+FROM app1_userinfo ui
+
+LEFT JOIN app1_teamusers tu
+    ON tu.user_id = ui.user_id
+
+LEFT JOIN app1_teaminfo ti
+    ON ti.team_id = tu.team_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0009_userlogininfo_refresh_digest'),
+    ]
+
+    operations = [
+        migrations.RunPython(retire_duplicate_members, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='teamusers',
+            constraint=models.UniqueConstraint(condition=Q(team_user_deleted=0), fields=('team', 'user'),
+                                               name='teamusers_unique_member'),
+        ),
+        migrations.RunSQL(
+            sql=VIEW_SQL,
+            reverse_sql=REVERSE_SQL,
+        ),
+    ]
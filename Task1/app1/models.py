@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 import uuid
 
 ROLE_CHOICES = [(1, "Project Owner"), (2, "Maintainer"), (3, "Developer")]
@@ -16,6 +17,13 @@ class UserInfo(models.Model):
     user_photo_path = models.CharField(max_length=45, null=True, blank=True)
     user_photo_link = models.CharField(max_length=45, null=True, blank=True)
     user_fullname = models.CharField(max_length=45)
+
+    class Meta:
+        indexes = [
+            # GetUsers: WHERE user_deleted = 0 ORDER BY user_date_of_creation, user_id
+            models.Index(fields=["user_date_of_creation", "user_id"], condition=Q(user_deleted=0),
+                         name="userinfo_active_page_idx"),
+        ]
     
     def __str__(self): 
         return self.user_name
@@ -24,10 +32,22 @@ class UserLoginInfo(models.Model):
     user = models.ForeignKey(UserInfo, on_delete=models.CASCADE)
     login_session_id = models.CharField(max_length=64, unique=True)
     login_date_time = models.DateTimeField(auto_now_add=True)
-    jwt_token = models.TextField(unique=True)
+    # SHA-256 hex of the JWT (app1.session_cache.token_digest); the token itself is never stored
+    token_digest = models.CharField(max_length=64, unique=True)
+    # SHA-256 hex of the current refresh token's secret and of the one it
+    # replaced (app1.tokens.refresh_token); the previous one is kept to
+    # detect a rotated refresh token being used again
+    refresh_digest = models.CharField(max_length=64, null=True, blank=True)
+    previous_refresh_digest = models.CharField(max_length=64, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True) 
     expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # range scans of the retention sweeper (app1.retention)
+            models.Index(fields=["expires_at"], name="userlogininfo_expires_idx"),
+        ]
     
     def __str__(self): 
         return f"{self.user.user_name} session"
@@ -40,6 +60,13 @@ class TeamInfo(models.Model):
     team_created_datetime = models.DateTimeField(auto_now_add=True)
     team_deleted = models.PositiveSmallIntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            # also the index behind RegisterTeamMates' team_name lookup
+            models.UniqueConstraint(fields=["team_name"], condition=Q(team_deleted=0),
+                                    name="teaminfo_unique_active_name"),
+        ]
+
     def __str__(self): 
         return self.team_name
 
@@ -51,6 +78,14 @@ class TeamUsers(models.Model):
     team_user_active = models.PositiveSmallIntegerField(default=1)
     team_user_deleted = models.PositiveSmallIntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            # concurrent registrations of the same member; a removed
+            # (soft-deleted) member can register again
+            models.UniqueConstraint(fields=["team", "user"], condition=Q(team_user_deleted=0),
+                                    name="teamusers_unique_member"),
+        ]
+
     def __str__(self): 
         return f"{self.team.team_name} - {self.user.user_name}"
 
@@ -66,7 +101,6 @@ class AllUserInfo_View(models.Model):
     user_role = models.PositiveSmallIntegerField(choices=ROLE_CHOICES, null=True)
     login_session_id = models.CharField(max_length=64, null=True)
     login_date_time = models.DateTimeField(null=True)
-    jwt_token = models.TextField(null=True)
     login_is_active = models.BooleanField(null=True)
     created_at = models.DateTimeField(null=True)
     expires_at = models.DateTimeField(null=True)
@@ -90,10 +124,78 @@ class AllTeamInfo_View(models.Model):
     team_user_date_of_creation = models.DateTimeField(null=True)
     team_user_active = models.PositiveSmallIntegerField(null=True)
     team_user_deleted = models.PositiveSmallIntegerField(null=True)
+    team_user_key = models.BigIntegerField()
 
     class Meta: 
         managed = False 
         db_table = "allteaminfo_view"
 
     def __str__(self): 
-        return self.user_name
\ No newline at end of file
+        return self.user_name
+
+
+class UserInfoReport(models.Model):
+    """Columns shared by the materialized / latest-session user reports."""
+    user_id = models.UUIDField(primary_key=True)
+    user_name = models.CharField(max_length=20)
+    user_email = models.EmailField()
+    user_date_of_creation = models.DateField()
+    user_last_passcode_update = models.DateField(null=True)
+    user_active = models.PositiveSmallIntegerField(null=True)
+    user_deleted = models.PositiveSmallIntegerField(null=True)
+    user_role = models.PositiveSmallIntegerField(choices=ROLE_CHOICES, null=True)
+    login_session_id = models.CharField(max_length=64, null=True)
+    login_date_time = models.DateTimeField(null=True)
+    login_is_active = models.BooleanField(null=True)
+    created_at = models.DateTimeField(null=True)
+    expires_at = models.DateTimeField(null=True)
+    session_key = models.CharField(max_length=64)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.user_name
+
+
+class AllUserInfo_MView(UserInfoReport):
+
+    class Meta:
+        managed = False
+        db_table = "alluserinfo_mview"
+
+
+class LatestUserInfo_View(UserInfoReport):
+
+    class Meta:
+        managed = False
+        db_table = "latestuserinfo_view"
+
+
+class LatestUserInfo_MView(UserInfoReport):
+
+    class Meta:
+        managed = False
+        db_table = "latestuserinfo_mview"
+
+
+class AllTeamInfo_MView(models.Model):
+    user_id = models.UUIDField(primary_key=True)
+    team_id = models.CharField(max_length=10, null=True)
+    team_name = models.CharField(max_length=15, null=True)
+    team_created_by = models.CharField(max_length=10, null=True)
+    team_created_datetime = models.DateTimeField(null=True)
+    team_deleted = models.PositiveSmallIntegerField(null=True)
+    team_user_team_role = models.PositiveSmallIntegerField(choices=ROLE_CHOICES, null=True)
+    team_user_date_of_creation = models.DateTimeField(null=True)
+    team_user_active = models.PositiveSmallIntegerField(null=True)
+    team_user_deleted = models.PositiveSmallIntegerField(null=True)
+    team_key = models.CharField(max_length=10)
+    team_user_key = models.BigIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = "allteaminfo_mview"
+
+    def __str__(self):
+        return f"{self.team_key} - {self.user_id}"
@@ -0,0 +1,103 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from app1.data_versions import ALL_SCOPES, bump
+from app1.models import (AllUserInfo_View, AllUserInfo_MView, LatestUserInfo_View,
+                         LatestUserInfo_MView, AllTeamInfo_View, AllTeamInfo_MView)
+
+logger = logging.getLogger(__name__)
+
+MATERIALIZED_VIEWS = ("alluserinfo_mview", "latestuserinfo_mview", "allteaminfo_mview")
+
+
+def materialized():
+    return settings.REPORTING_VIEWS_MATERIALIZED
+
+
+def user_info_rows(latest=False):
+    """
+    Rows of the user report, one per login (or one per user with
+    ``latest``), always with a non-null ``session_key`` column to page on.
+    """
+    if latest:
+        model = LatestUserInfo_MView if materialized() else LatestUserInfo_View
+        return model.objects.all()
+    if materialized():
+        return AllUserInfo_MView.objects.all()
+    return AllUserInfo_View.objects.annotate(session_key=Coalesce("login_session_id", Value("")))
+
+
+def team_info_rows():
+    """Rows of the team report, always with non-null ``team_key`` and ``team_user_key`` columns."""
+    if materialized():
+        return AllTeamInfo_MView.objects.all()
+    return AllTeamInfo_View.objects.annotate(team_key=Coalesce("team_id", Value("")))
+
+
+def refresh_materialized_views(concurrently=True):
+    # CONCURRENTLY keeps the views readable during the refresh (uses the
+    # unique *_key indexes); a plain refresh locks readers out but is faster
+    keyword = "CONCURRENTLY " if concurrently else ""
+    with connection.cursor() as cursor:
+        for view in MATERIALIZED_VIEWS:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {keyword}{view}")
+    # pages cached while the views were stale must not outlive the refresh
+    if materialized():
+        bump(*ALL_SCOPES)
+
+
+# set while some process has a refresh pending; with the Redis cache every
+# worker and replica sees it, so a write burst costs one refresh in total
+REFRESH_PENDING_KEY = "reporting:refresh_pending"
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.API_RESPONSE_CACHE_ALIAS]
+
+
+def schedule_refresh():
+    """
+    Refresh the materialized views once writes have settled: every call
+    within REPORTING_REFRESH_DEBOUNCE_SECONDS of the first, in any process
+    sharing the cache, is folded into a single refresh. Call it after the
+    write committed. Does nothing unless materialized mode is on and the
+    debounce is positive (use the refresh_reporting_views command instead).
+    """
+    global _timer
+    delay = settings.REPORTING_REFRESH_DEBOUNCE_SECONDS
+    if not materialized() or delay <= 0:
+        return
+
+    with _timer_lock:
+        if _timer is not None:
+            return
+        # expires on its own should the process holding it die first
+        if not _cache().add(REFRESH_PENDING_KEY, True, timeout=delay * 2):
+            return
+        _timer = threading.Timer(delay, _run_scheduled_refresh)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _run_scheduled_refresh():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    try:
+        # writes committed from here on are not guaranteed to be in this
+        # refresh: let them schedule the next one
+        _cache().delete(REFRESH_PENDING_KEY)
+        refresh_materialized_views()
+    except Exception:
+        logger.exception("materialized view refresh failed")
+    finally:
+        connection.close()
@@ -0,0 +1,311 @@
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app1.data_versions import bump
+from app1.models import UserInfo, UserLoginInfo
+from app1.reporting import schedule_refresh
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock id so only one sweeper (across workers and pods) deletes at a time
+SWEEP_LOCK_ID = 0x5E55_1011
+
+TABLE = UserLoginInfo._meta.db_table
+
+# views reading the login table, in creation order (dropped and recreated
+# around the partitioning conversion)
+DEPENDENT_VIEWS = ("alluserinfo_view", "alluserinfo_mview", "latestuserinfo_view", "latestuserinfo_mview")
+
+
+def max_session_lifetime():
+    """Longest a session can last: its ``expires_at`` is set at login and never extended."""
+    return timedelta(hours=settings.REFRESH_TOKEN_EXPIRY_HOURS)
+
+
+def purge_expired_sessions(retention=None, batch_size=None, pause=0.0, max_batches=None):
+    """
+    Delete sessions whose ``expires_at`` is older than ``retention``. Rows
+    without an ``expires_at`` (written before it existed) count as expiring
+    ``max_session_lifetime`` after ``created_at``.
+
+    Rows go in batches of ``batch_size`` primary keys, each in its own short
+    transaction, so no lock is held for longer than one small DELETE. Returns
+    the number of rows deleted; 0 if another sweeper holds the lock.
+    """
+    if retention is None:
+        retention = timedelta(hours=settings.SESSION_RETENTION_HOURS)
+    batch_size = batch_size or settings.SESSION_PURGE_BATCH_SIZE
+    cutoff = timezone.now() - retention
+    expired = UserLoginInfo.objects.filter(
+        Q(expires_at__lt=cutoff) | Q(expires_at__isnull=True, created_at__lt=cutoff - max_session_lifetime())
+    )
+
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            if not _try_lock():
+                break
+            ids = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            # no post_delete signals: delete() would load every row to send them
+            batch = UserLoginInfo.objects.filter(pk__in=ids)
+            deleted += batch._raw_delete(batch.db)
+
+        batches += 1
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    if deleted:
+        bump("logins")
+        schedule_refresh()
+    return deleted
+
+
+def sweep():
+    """One sweeper pass: partition upkeep (when partitioned), then the purge."""
+    if is_partitioned():
+        with transaction.atomic():
+            if _try_lock():
+                maintain_partitions()
+    return purge_expired_sessions()
+
+
+def _try_lock():
+    if connection.vendor != "postgresql":
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [SWEEP_LOCK_ID])
+        return cursor.fetchone()[0]
+
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def start_session_sweeper():
+    """
+    Start the background sweeper thread for this process, every
+    SESSION_SWEEP_INTERVAL_SECONDS (0 disables it). Called by gunicorn.conf.py
+    in each worker, never on import, so shells, management commands and
+    tests run without one. Safe to call repeatedly; a forked worker gets its
+    own thread because the pid changes.
+    """
+    global _sweeper_pid
+    interval = settings.SESSION_SWEEP_INTERVAL_SECONDS
+    if interval <= 0:
+        return
+
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+
+    thread = threading.Thread(target=sweep_forever, args=(interval,), name="session-sweeper", daemon=True)
+    thread.start()
+
+
+def sweep_forever(interval):
+    while True:
+        # jitter so workers started together do not all wake at once
+        time.sleep(interval * random.uniform(0.8, 1.2))
+        try:
+            deleted = sweep()
+            if deleted:
+                logger.info("purged %d expired sessions", deleted)
+        except Exception:
+            logger.exception("session sweep failed")
+        finally:
+            connection.close()
+
+
+# -------------------------------------------------------------------------
+# Optional monthly range partitioning of the login table on created_at.
+# Old months are then dropped whole instead of deleted row by row.
+# -------------------------------------------------------------------------
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+        return cursor.fetchone()[0] == "p"
+
+
+def _month(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _partition_name(month):
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def _partitions(cursor):
+    """{month start: partition name} of the monthly partitions."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [TABLE],
+    )
+    prefix = f"{TABLE}_p"
+    months = {}
+    for (name,) in cursor.fetchall():
+        if name.startswith(prefix):
+            year, month = name[len(prefix):].split("_")
+            months[datetime(int(year), int(month), 1, tzinfo=dt_timezone.utc)] = name
+    return months
+
+
+def _create_partitions(cursor, start, end, existing=()):
+    created = []
+    month = _month(start)
+    while month <= end:
+        if month not in existing:
+            name = _partition_name(month)
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+                [month, _next_month(month)],
+            )
+            created.append(name)
+        month = _next_month(month)
+    return created
+
+
+def expired_partitions(partitions, cutoff):
+    """
+    Names of the ``{month start: name}`` partitions that can only hold
+    sessions purged at ``cutoff``: the partitions go by ``created_at`` and a
+    session expires up to ``max_session_lifetime`` later, so the whole month
+    must end that much before the cutoff.
+    """
+    last_created = cutoff - max_session_lifetime()
+    return [name for month, name in sorted(partitions.items()) if _next_month(month) <= last_created]
+
+
+def maintain_partitions(months_ahead=None, retention=None):
+    """
+    Create the partitions for the next ``months_ahead`` months and drop every
+    partition whose sessions all expired more than ``retention`` ago.
+    Returns ``(created, dropped)`` partition names.
+    """
+    if months_ahead is None:
+        months_ahead = settings.SESSION_PARTITION_MONTHS_AHEAD
+    if retention is None:
+        retention = timedelta(hours=settings.SESSION_RETENTION_HOURS)
+
+    now = timezone.now()
+    horizon = now
+    for _ in range(months_ahead):
+        horizon = _next_month(horizon)
+    cutoff = now - retention
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = _partitions(cursor)
+        created = _create_partitions(cursor, now, horizon, existing)
+
+        dropped = expired_partitions(existing, cutoff)
+        for name in dropped:
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+
+    if dropped:
+        bump("logins")
+        schedule_refresh()
+    return created, dropped
+
+
+def convert_to_partitioned(months_ahead=None):
+    """
+    Rebuild the login table as a monthly range-partitioned table.
+
+    Runs in one transaction holding an exclusive lock on the table while the
+    rows are copied, so run it in a maintenance window. Uniqueness of
+    ``login_session_id`` / ``token_digest`` becomes per partition (Postgres
+    requires the partition key in unique indexes); both are random values so
+    this is not a practical loss.
+    """
+    if months_ahead is None:
+        months_ahead = settings.SESSION_PARTITION_MONTHS_AHEAD
+    old = f"{TABLE}_unpartitioned"
+    user_table = UserInfo._meta.db_table
+    user_pk = UserInfo._meta.pk.column
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+
+        views = []
+        for view in DEPENDENT_VIEWS:
+            cursor.execute(
+                "SELECT relkind, pg_get_viewdef(oid) FROM pg_class WHERE relname = %s", [view]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s", [view])
+            views.append((view, row[0] == "m", row[1], [r[0] for r in cursor.fetchall()]))
+
+        # non-unique indexes carry over as partitioned indexes; the unique
+        # ones are rebuilt below with created_at added
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = %s::regclass AND NOT indisunique",
+            [TABLE],
+        )
+        indexes = [r[0] for r in cursor.fetchall()]
+
+        for view, is_materialized, _, _ in reversed(views):
+            cursor.execute(f"DROP {'MATERIALIZED VIEW' if is_materialized else 'VIEW'} {view}")
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {old}")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD UNIQUE (login_session_id, created_at)")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD UNIQUE (token_digest, created_at)")
+
+        cursor.execute(f"SELECT min(created_at) FROM {old}")
+        first = cursor.fetchone()[0] or timezone.now()
+        horizon = timezone.now()
+        for _ in range(months_ahead):
+            horizon = _next_month(horizon)
+        _create_partitions(cursor, first, horizon)
+        # catches rows outside the prepared months instead of failing the insert
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {old}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}",
+            [TABLE],
+        )
+        cursor.execute(f"DROP TABLE {old}")
+
+        for index in indexes:
+            cursor.execute(index)
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD FOREIGN KEY (user_id) REFERENCES {user_table} ({user_pk}) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+
+        for view, is_materialized, definition, view_indexes in views:
+            kind = "MATERIALIZED VIEW" if is_materialized else "VIEW"
+            cursor.execute(f"CREATE {kind} {view} AS {definition}")
+            for index in view_indexes:
+                cursor.execute(index)
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+def token_digest(token):
+    """SHA-256 hex digest of a raw JWT, used as the session lookup key."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    session_pk: int
+    user_id: str
+    user_name: str
+    expires_at: float | None   # unix timestamp, None = no expiry
+
+
+@dataclass(frozen=True)
+class SessionUser:
+    """
+    ``request.user`` set by AuthMiddleware: whose session the request
+    carries, taken from the session without loading the UserInfo row.
+    """
+    user_id: str
+    user_name: str
+
+    is_authenticated = True
+    is_anonymous = False
+
+    @property
+    def pk(self):
+        return self.user_id
+
+    @classmethod
+    def of(cls, session):
+        return cls(user_id=session.user_id, user_name=session.user_name)
+
+
+class LRUTTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries also carry a deadline.
+
+    Entries are dropped when they pass their deadline or when the cache
+    grows past ``max_entries`` (least recently used first).
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, deadline = item
+            if deadline <= now:
+                self._evict(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at=None):
+        deadline = time.time() + self.ttl_seconds
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            if key in self._data:
+                self._evict(key)
+            self._data[key] = (value, deadline)
+            self._added(key, value)
+            while len(self._data) > self.max_entries:
+                self._evict(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    # hooks for subclasses keeping secondary indexes, called with the lock held
+    def _added(self, key, value):
+        pass
+
+    def _evict(self, key):
+        return self._data.pop(key)
+
+
+class SessionCache(LRUTTLCache):
+    """
+    Token digest -> CachedSession, with a per-user index so every session of
+    a user can be dropped at once (logout everywhere / user deletion).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._by_user = {}
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(str(user_id), ())):
+                self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_user.clear()
+
+    def _added(self, key, value):
+        self._by_user.setdefault(value.user_id, set()).add(key)
+
+    def _evict(self, key):
+        value, deadline = self._data.pop(key)
+        keys = self._by_user.get(value.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[value.user_id]
+        return value, deadline
+
@@ -0,0 +1,180 @@
+import json
+import logging
+import time
+from dataclasses import asdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from app1.session_cache import CachedSession, SessionCache
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSessionStore:
+    """
+    Cache of verified sessions sitting in front of UserLoginInfo.
+
+    ``get`` returning None means "unknown here, ask the database"; the
+    database row stays the source of truth, so a backend may always miss.
+    """
+
+    def get(self, digest):
+        raise NotImplementedError
+
+    def set(self, digest, session):
+        raise NotImplementedError
+
+    def revoke(self, digest):
+        raise NotImplementedError
+
+    def revoke_user(self, user_id):
+        raise NotImplementedError
+
+    # Async variants for AuthMiddleware on the event loop. Backends that do
+    # network I/O run the sync call in a worker thread; in-process backends
+    # override these to skip the hop.
+
+    async def aget(self, digest):
+        return await sync_to_async(self.get, thread_sensitive=False)(digest)
+
+    async def aset(self, digest, session):
+        return await sync_to_async(self.set, thread_sensitive=False)(digest, session)
+
+    async def arevoke(self, digest):
+        return await sync_to_async(self.revoke, thread_sensitive=False)(digest)
+
+
+class DatabaseSessionStore(BaseSessionStore):
+    """No caching: every auth check goes to UserLoginInfo (the original path)."""
+
+    def get(self, digest):
+        return None
+
+    def set(self, digest, session):
+        pass
+
+    def revoke(self, digest):
+        pass
+
+    def revoke_user(self, user_id):
+        pass
+
+    async def aget(self, digest):
+        return None
+
+    async def aset(self, digest, session):
+        pass
+
+    async def arevoke(self, digest):
+        pass
+
+
+class LocalSessionStore(BaseSessionStore):
+    """
+    Per-process LRU/TTL cache. Revocations only reach the current process,
+    so use it for single replica deployments or together with a short TTL.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300):
+        self.cache = SessionCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def get(self, digest):
+        return self.cache.get(digest)
+
+    def set(self, digest, session):
+        self.cache.set(digest, session, expires_at=session.expires_at)
+
+    def revoke(self, digest):
+        self.cache.delete(digest)
+
+    def revoke_user(self, user_id):
+        self.cache.delete_user(user_id)
+
+    async def aget(self, digest):
+        return self.get(digest)
+
+    async def aset(self, digest, session):
+        self.set(digest, session)
+
+    async def arevoke(self, digest):
+        self.revoke(digest)
+
+
+class RedisSessionStore(BaseSessionStore):
+    """
+    Shared store on a Redis-protocol server, so a logout on one replica is
+    seen by every other replica on its next request.
+
+    ``CLIENT_CLASS`` may point at any class with a redis-py compatible
+    ``from_url`` (e.g. ``fakeredis.FakeRedis`` in tests). Redis errors are
+    logged and treated as a miss so auth falls back to the database; a
+    failed revoke is logged too, the database write it follows stands.
+    """
+
+    def __init__(self, location="redis://localhost:6379/0", key_prefix="session",
+                 ttl_seconds=300, client_class="redis.Redis"):
+        self.client = import_string(client_class).from_url(location)
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+
+    def _session_key(self, digest):
+        return f"{self.key_prefix}:s:{digest}"
+
+    def _user_key(self, user_id):
+        return f"{self.key_prefix}:u:{user_id}"
+
+    def get(self, digest):
+        try:
+            raw = self.client.get(self._session_key(digest))
+        except Exception:
+            logger.exception("session store read failed")
+            return None
+        if raw is None:
+            return None
+        return CachedSession(**json.loads(raw))
+
+    def set(self, digest, session):
+        ttl = self.ttl_seconds
+        if session.expires_at is not None:
+            ttl = min(ttl, int(session.expires_at - time.time()))
+        if ttl <= 0:
+            return
+        user_key = self._user_key(session.user_id)
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(self._session_key(digest), json.dumps(asdict(session)), ex=ttl)
+            pipe.sadd(user_key, digest)
+            pipe.expire(user_key, self.ttl_seconds)
+            pipe.execute()
+        except Exception:
+            logger.exception("session store write failed")
+
+    def revoke(self, digest):
+        # the database row is already inactive: a failure here leaves the
+        # cached session valid for up to ttl_seconds, it must not fail the request
+        try:
+            self.client.delete(self._session_key(digest))
+        except Exception:
+            logger.exception("session store revoke failed")
+
+    def revoke_user(self, user_id):
+        user_key = self._user_key(user_id)
+        try:
+            digests = self.client.smembers(user_key)
+            keys = [self._session_key(d.decode() if isinstance(d, bytes) else d) for d in digests]
+            self.client.delete(user_key, *keys)
+        except Exception:
+            logger.exception("session store revoke failed")
+
+
+_store = None
+
+
+def get_session_store():
+    global _store
+    if _store is None:
+        config = settings.SESSION_STORE
+        _store = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _store
@@ -0,0 +1,20 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app1.data_versions import MODEL_SCOPES, bump
+from app1.models import UserInfo, UserLoginInfo, TeamInfo, TeamUsers
+from app1.reporting import schedule_refresh
+
+
+@receiver([post_save, post_delete], sender=UserInfo)
+@receiver([post_save, post_delete], sender=UserLoginInfo)
+@receiver([post_save, post_delete], sender=TeamInfo)
+@receiver([post_save, post_delete], sender=TeamUsers)
+def refresh_reports(sender, **kwargs):
+    # after commit, so no reader can cache the old rows under the new version
+    # and the refresh is sure to see the write
+    transaction.on_commit(partial(bump, MODEL_SCOPES[sender]))
+    transaction.on_commit(schedule_refresh)
@@ -0,0 +1,47 @@
+"""
+Helpers shared by the test modules of app1 and api.
+
+Not named ``test*.py``, so the test runner does not collect it.
+"""
+
+import bcrypt
+
+from app1.models import UserInfo
+
+
+def create_user(user_name, password="secret", user_role=3):
+    """A user stored the way CreateUser stores one, hashed at the cheapest cost."""
+    return UserInfo.objects.create(
+        user_name=user_name,
+        user_email=f"{user_name}@example.com",
+        user_password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(4)).decode(),
+        user_role=user_role,
+        user_fullname=user_name.title(),
+    )
+
+
+class LoggedInUserMixin:
+    """
+    Creates ``user_name`` once per TestCase and logs in as it through the
+    API. Mix in before TestCase.
+    """
+
+    user_name = "tester"
+    user_role = 3
+    password = "secret"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = create_user(cls.user_name, cls.password, cls.user_role)
+
+    def login_response(self):
+        return self.client.post(
+            "/api/login",
+            {"user_name": self.user_name, "user_password": self.password},
+            content_type="application/json",
+        )
+
+    def login(self):
+        """The ``data`` of a fresh login: ``token`` and ``refresh_token``."""
+        return self.login_response().json()["data"]
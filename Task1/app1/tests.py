@@ -1,3 +1,789 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from functools import partial
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+import bcrypt
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.request import Request
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+try:
+    import gunicorn
+except ImportError:
+    gunicorn = None
+
+from api.serializers import UserInfoRowSerializer
+from api.streaming import ndjson_response
+from app1.admission import AdmissionController, Gate
+from app1.db_router import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from app1.middleware import AuthMiddleware
+from app1.models import UserInfo, UserLoginInfo, TeamInfo, TeamUsers
+from app1.reporting import refresh_materialized_views
+from app1 import reporting, retention, session_store, tokens
+from app1.session_cache import token_digest
+from app1.tokens import access_token
+from app1.testing import LoggedInUserMixin, create_user
+
+
+SEED_USERS = 5000
+SEED_LOGINS_PER_USER = 2
+SEED_TEAMS = 2000
+
+APP_TABLES = {
+    "app1_userinfo",
+    "app1_userlogininfo",
+    "app1_teaminfo",
+    "app1_teamusers",
+    "alluserinfo_mview",
+    "latestuserinfo_mview",
+    "allteaminfo_mview",
+}
+
+
+def seq_scans(plan):
+    """Relations of our own tables read with a sequential scan anywhere in ``plan``."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in APP_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "query plan checks need PostgreSQL")
+@override_settings(API_RESPONSE_CACHE=False)
+class QueryPlanTests(TestCase):
+    """
+    Runs each endpoint against a seeded database, EXPLAINs every query it
+    issued and fails if any of them falls back to a sequential scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        password = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode()
+
+        users = UserInfo.objects.bulk_create([
+            UserInfo(
+                user_name=f"user{i}",
+                user_email=f"user{i}@example.com",
+                user_password=password,
+                user_role=3,
+                user_fullname=f"User {i}",
+                user_deleted=1 if i % 10 == 0 else 0,
+            )
+            for i in range(SEED_USERS)
+        ])
+        UserLoginInfo.objects.bulk_create([
+            UserLoginInfo(
+                user=user,
+                login_session_id=secrets.token_hex(32),
+                token_digest=secrets.token_hex(32),
+                is_active=False,
+            )
+            for user in users
+            for _ in range(SEED_LOGINS_PER_USER)
+        ])
+        teams = TeamInfo.objects.bulk_create([
+            TeamInfo(user=users[i], team_id=f"T{i}", team_name=f"team{i}", team_created_by="seed")
+            for i in range(SEED_TEAMS)
+        ])
+        TeamUsers.objects.bulk_create([
+            TeamUsers(user=user, team=teams[i % SEED_TEAMS], team_user_team_role=3)
+            for i, user in enumerate(users)
+        ])
+
+        refresh_materialized_views(concurrently=False)
+        with connection.cursor() as cursor:
+            for table in APP_TABLES:
+                cursor.execute(f"ANALYZE {table}")
+
+        cls.user = users[1]
+
+    def setUp(self):
+        response = self.client.post(
+            "/api/login",
+            {"user_name": self.user.user_name, "user_password": "secret"},
+            content_type="application/json",
+        )
+        self.token = response.json()["data"]["token"]
+
+    def assertNoSeqScan(self, queries):
+        checked = 0
+        for query in queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans = seq_scans(plan[0]["Plan"])
+            self.assertEqual(scans, [], f"sequential scan on {scans} for:\n{sql}")
+            checked += 1
+        self.assertGreater(checked, 0, "no queries captured")
+
+    def request(self, method, path, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(
+                path, HTTP_AUTHORIZATION=self.token, content_type="application/json", **kwargs
+            )
+        self.assertLess(response.status_code, 500, response.content)
+        return ctx.captured_queries
+
+    def test_session_lookup(self):
+        queryset = UserLoginInfo.objects.select_related("user").filter(
+            token_digest=token_digest(self.token), is_active=True
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            list(queryset)
+        self.assertNoSeqScan(ctx.captured_queries)
+
+    def test_login(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(
+                "/api/login",
+                {"user_name": self.user.user_name, "user_password": "secret"},
+                content_type="application/json",
+            )
+        self.assertNoSeqScan(ctx.captured_queries)
+
+    def test_logout(self):
+        self.assertNoSeqScan(self.request("post", f"/api/logout/{self.user.user_name}"))
+
+    def test_get_users(self):
+        self.assertNoSeqScan(self.request("get", "/api/get_users"))
+
+        cursor = self.client.get("/api/get_users", HTTP_AUTHORIZATION=self.token).json()["meta"]["next_cursor"]
+        self.assertNoSeqScan(self.request("get", f"/api/get_users?cursor={cursor}"))
+
+    def test_update_user(self):
+        self.assertNoSeqScan(self.request("patch", f"/api/update_user_details/{self.user.user_name}",
+                                          data={"user_fullname": "Renamed"}))
+
+    def test_delete_user(self):
+        self.assertNoSeqScan(self.request("delete", f"/api/delete_user/{self.user.user_name}"))
+
+    def test_register_teammates_team_lookup(self):
+        self.assertNoSeqScan(self.request("post", "/api/register_teammates/team7", data={}))
+
+    @override_settings(REPORTING_VIEWS_MATERIALIZED=True, REPORTING_REFRESH_DEBOUNCE_SECONDS=0)
+    def test_reporting_views_materialized(self):
+        self.assertNoSeqScan(self.request("get", "/api/get_all_user_details"))
+        self.assertNoSeqScan(self.request("get", "/api/get_all_user_details?latest=1"))
+        self.assertNoSeqScan(self.request("get", "/api/get_teams"))
+
+
+@override_settings(REPORTING_VIEWS_MATERIALIZED=True, REPORTING_REFRESH_DEBOUNCE_SECONDS=60)
+class ReportingRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(self.cancel)
+
+    def cancel(self):
+        if reporting._timer is not None:
+            reporting._timer.cancel()
+            reporting._timer = None
+
+    def test_writes_share_one_pending_refresh(self):
+        reporting.schedule_refresh()
+        timer = reporting._timer
+        self.assertIsNotNone(timer)
+        reporting.schedule_refresh()
+        self.assertIs(reporting._timer, timer)
+
+    def test_no_refresh_while_another_process_has_one_pending(self):
+        cache.add(reporting.REFRESH_PENDING_KEY, True)
+        reporting.schedule_refresh()
+        self.assertIsNone(reporting._timer)
+
+
+@override_settings(REFRESH_TOKEN_EXPIRY_HOURS=24)
+class RetentionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("sweeper")
+
+    def session(self, expires_at, created_at=None):
+        login = UserLoginInfo.objects.create(
+            user=self.user, login_session_id=secrets.token_hex(32), token_digest=secrets.token_hex(32),
+            expires_at=expires_at,
+        )
+        if created_at is not None:
+            UserLoginInfo.objects.filter(pk=login.pk).update(created_at=created_at)
+        return login
+
+    def test_purges_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for _ in range(5):
+            self.session(now - timedelta(days=3))
+        recent = self.session(now - timedelta(hours=1))
+        active = self.session(now + timedelta(hours=1))
+
+        self.assertEqual(retention.purge_expired_sessions(timedelta(days=1), batch_size=2, max_batches=1), 2)
+        self.assertEqual(retention.purge_expired_sessions(timedelta(days=1), batch_size=2), 3)
+        self.assertEqual(set(UserLoginInfo.objects.values_list("pk", flat=True)), {recent.pk, active.pk})
+
+    def test_sessions_without_expiry_age_out_by_creation(self):
+        now = timezone.now()
+        old = self.session(None, created_at=now - timedelta(days=3))
+        young = self.session(None, created_at=now - timedelta(hours=30))
+
+        # created 30 hours ago: expired 6 hours ago at the latest, inside the retention
+        self.assertEqual(retention.purge_expired_sessions(timedelta(days=1)), 1)
+        self.assertFalse(UserLoginInfo.objects.filter(pk=old.pk).exists())
+        self.assertTrue(UserLoginInfo.objects.filter(pk=young.pk).exists())
+
+    def test_serving_requests_starts_no_sweeper(self):
+        self.client.get("/api/get_users")
+        self.assertNotIn("session-sweeper", [thread.name for thread in threading.enumerate()])
+
+    def test_partitions_dropped_once_their_sessions_expired(self):
+        partitions = {
+            datetime(2026, month, 1, tzinfo=dt_timezone.utc): f"p{month}" for month in (3, 4, 5)
+        }
+        # sessions created in April expire as late as May 2, after this cutoff
+        cutoff = datetime(2026, 5, 1, 6, tzinfo=dt_timezone.utc)
+        self.assertEqual(retention.expired_partitions(partitions, cutoff), ["p3"])
+        self.assertEqual(retention.expired_partitions(partitions, cutoff + timedelta(days=1)), ["p3", "p4"])
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only; no query reaches a database."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def route(self, request, view):
+        seen = {}
+
+        def get_response(request):
+            seen["db"] = view()
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen["db"], response
+
+    def read_from_replica(self):
+        use_replica()
+        return self.router.db_for_read(UserInfo)
+
+    def test_reads_stay_on_primary_by_default(self):
+        db, _ = self.route(self.factory.get("/api/login"), lambda: self.router.db_for_read(UserInfo))
+        self.assertEqual(db, "default")
+        self.assertEqual(self.router.db_for_read(UserInfo), "default")
+
+    def test_list_reads_use_replica(self):
+        db, response = self.route(self.factory.get("/api/get_users"), self.read_from_replica)
+        self.assertEqual(db, "replica1")
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_ndjson_export_reads_from_replica(self):
+        def export():
+            use_replica()
+            request = Request(self.factory.get("/api/get_users?format=ndjson"))
+            return ndjson_response(request, UserInfo.objects.values_list("user_name"), ["user_name"],
+                                   UserInfoRowSerializer.serialize)
+
+        response, _ = self.route(self.factory.get("/api/get_users?format=ndjson"), export)
+        # the rows are read once the middleware is done; no database here,
+        # so the read fails naming the alias it was sent to
+        with self.assertRaisesRegex(Exception, "'replica1'"):
+            next(iter(response.streaming_content))
+
+    def test_write_pins_client_to_primary(self):
+        def write_then_read():
+            self.assertEqual(self.router.db_for_write(UserInfo), "default")
+            return self.read_from_replica()
+
+        request = self.factory.patch("/api/update_user_details/u1", HTTP_AUTHORIZATION="token-a")
+        db, response = self.route(request, write_then_read)
+        self.assertEqual(db, "default")
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        # same token, no cookie: pinned by the in-process map
+        db, _ = self.route(self.factory.get("/api/get_users", HTTP_AUTHORIZATION="token-a"), self.read_from_replica)
+        self.assertEqual(db, "default")
+
+        # cookie, other token
+        request = self.factory.get("/api/get_users", HTTP_AUTHORIZATION="token-b")
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        db, _ = self.route(request, self.read_from_replica)
+        self.assertEqual(db, "default")
+
+        db, _ = self.route(self.factory.get("/api/get_users", HTTP_AUTHORIZATION="token-b"), self.read_from_replica)
+        self.assertEqual(db, "replica1")
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "app1"))
+        self.assertTrue(self.router.allow_migrate("default", "app1"))
+
+
+@override_settings(API_RATE_LIMITS={})
+class AuthMiddlewareTests(LoggedInUserMixin, TestCase):
+    """Protected and public views, under the sync (WSGI) and the ASGI handler."""
+
+    user_name = "guarded"
+
+    def test_protected_view_needs_token(self):
+        self.assertEqual(self.client.get("/api/get_users").status_code, 401)
+        self.assertEqual(self.client.post("/api/logout/guarded").status_code, 401)
+        token = self.login()["token"]
+        self.assertEqual(self.client.get("/api/get_users", HTTP_AUTHORIZATION=token).status_code, 200)
+
+    def test_public_view_needs_no_token(self):
+        # reaches the view's own validation
+        response = self.client.post("/api/create_user", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_protected_view_needs_token_under_asgi(self):
+        response = await self.async_client.get("/api/get_users")
+        self.assertEqual(response.status_code, 401)
+        token = (await sync_to_async(self.login)())["token"]
+        response = await self.async_client.get("/api/get_users", headers={"Authorization": token})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_public_view_needs_no_token_under_asgi(self):
+        response = await self.async_client.post("/api/create_user", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_SAMPLE_RATE=1.0, API_RESPONSE_CACHE=False)
+class InstrumentationTests(LoggedInUserMixin, TestCase):
+
+    user_name = "profiled"
+
+    def test_server_timing_and_metrics(self):
+        # the client builds its handler, and so the middleware, on first use
+        login = self.login_response()
+        self.assertIn("bcrypt;dur=", login["Server-Timing"])
+
+        response = self.client.get("/api/get_users", HTTP_AUTHORIZATION=login.json()["data"]["token"])
+        timing = response["Server-Timing"]
+        self.assertIn("app;dur=", timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("serialize;dur=", timing)
+
+        metrics = self.client.get("/metrics").content.decode()
+        self.assertIn('api_request_duration_seconds_count{view="Login",method="POST"} 1', metrics)
+        self.assertIn('api_bcrypt_duration_seconds_bucket{view="Login",method="POST",le="+Inf"} 1', metrics)
+
+    def test_metrics_are_refused_to_other_addresses(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn(b"api_request_duration_seconds", response.content)
+
+    @override_settings(INSTRUMENTATION_METRICS_ALLOWED_IPS=["10.0.0.0/8"])
+    def test_metrics_for_an_allowed_network(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 200)
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN="scrape-me")
+    def test_metrics_with_the_token(self):
+        outside = {"REMOTE_ADDR": "203.0.113.7"}
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me", **outside).status_code, 200)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer guess", **outside).status_code, 404)
+
+
+@override_settings(API_RATE_LIMITS={}, API_RESPONSE_CACHE=False)
+class SessionCacheTests(LoggedInUserMixin, TestCase):
+    """AuthMiddleware in front of a LocalSessionStore of its own."""
+
+    user_name = "cached"
+
+    def setUp(self):
+        self.store = session_store.LocalSessionStore()
+        previous, session_store._store = session_store._store, self.store
+        self.addCleanup(setattr, session_store, "_store", previous)
+        self.tokens = self.login()
+        self.token = self.tokens["token"]
+
+    def get(self):
+        return self.client.get("/api/get_users", HTTP_AUTHORIZATION=self.token)
+
+    def session_lookups(self, queries):
+        return [q for q in queries if "app1_userlogininfo" in q["sql"]]
+
+    def test_cached_session_skips_lookup(self):
+        self.assertEqual(self.get().status_code, 200)
+        self.assertIsNotNone(self.store.get(token_digest(self.token)))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.session_lookups(ctx.captured_queries), [])
+
+    def authenticate(self, middleware):
+        request = RequestFactory().get("/api/get_users", HTTP_AUTHORIZATION=self.token)
+        return request, partial(middleware.process_view, request, resolve("/api/get_users").func, (), {})
+
+    def test_cached_session_user_needs_no_query(self):
+        self.get()
+        request, process_view = self.authenticate(AuthMiddleware(lambda request: HttpResponse()))
+        with self.assertNumQueries(0):
+            self.assertIsNone(process_view())
+            self.assertEqual(request.user.user_name, "cached")
+        self.assertEqual(request.user.pk, str(self.user.pk))
+
+    async def test_cached_session_user_under_asgi(self):
+        await sync_to_async(self.get)()
+
+        async def get_response(request):
+            return HttpResponse()
+
+        request, process_view = self.authenticate(AuthMiddleware(get_response))
+        self.assertIsNone(await process_view())
+        self.assertEqual(request.user.user_name, "cached")
+
+    def test_expired_session_is_rejected(self):
+        UserLoginInfo.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.get().status_code, 401)
+        self.assertFalse(UserLoginInfo.objects.get().is_active)
+        self.assertIsNone(self.store.get(token_digest(self.token)))
+
+    def test_logout_revokes_cached_session(self):
+        self.get()
+        self.client.post("/api/logout/cached", HTTP_AUTHORIZATION=self.token)
+        self.assertIsNone(self.store.get(token_digest(self.token)))
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_deleted_user_is_logged_out(self):
+        self.get()
+        response = self.client.delete("/api/delete_user/cached", HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserLoginInfo.objects.filter(is_active=True).exists())
+
+        self.assertEqual(self.get().status_code, 401)
+        refresh = self.client.post("/api/token/refresh", {"refresh_token": self.tokens["refresh_token"]},
+                                   content_type="application/json")
+        self.assertEqual(refresh.status_code, 401)
+
+    def test_deleted_user_without_revocation_is_rejected(self):
+        # a store on another replica that never saw the revocation expires
+        # the entry; the database lookup behind it must refuse the user
+        UserInfo.objects.filter(pk=self.user.pk).update(user_deleted=1)
+        self.assertEqual(self.get().status_code, 401)
+
+
+GUNICORN_CHILD = r"""
+import json, os, runpy, threading
+from gunicorn.app.base import Application
+
+class ConfigOnly(Application):
+    def load_config(self):
+        self.load_config_from_file("gunicorn.conf.py")
+
+    def load(self):
+        pass
+
+cfg = ConfigOnly().cfg
+# what preload_app does in the master, then what each worker runs
+from Task1.asgi import application
+from django.conf import settings
+master = [thread.name for thread in threading.enumerate()]
+cfg.post_worker_init(None)
+print(json.dumps({
+    "cpus": runpy.run_path("gunicorn.conf.py")["available_cpus"](),
+    "workers": cfg.workers,
+    "worker_class": cfg.worker_class_str,
+    "preload_app": cfg.preload_app,
+    "max_requests": cfg.max_requests,
+    "max_requests_jitter": cfg.max_requests_jitter,
+    "graceful_timeout": cfg.graceful_timeout,
+    "bcrypt_pool_workers": settings.BCRYPT_POOL_WORKERS,
+    "master_threads": master,
+    "worker_threads": [thread.name for thread in threading.enumerate()],
+}))
+"""
+
+
+@unittest.skipIf(gunicorn is None, "needs gunicorn")
+class GunicornConfigTests(SimpleTestCase):
+    """gunicorn.conf.py as gunicorn loads it, in a process of its own."""
+
+    def load(self, **env):
+        environ = {key: value for key, value in os.environ.items()
+                   if not key.startswith("GUNICORN_") and key not in ("WEB_CONCURRENCY", "BCRYPT_POOL_WORKERS")}
+        child = subprocess.run(
+            [sys.executable, "-c", GUNICORN_CHILD], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**environ, "SESSION_SWEEP_INTERVAL_SECONDS": "900", **env}, timeout=60,
+        )
+        self.assertEqual(child.returncode, 0, child.stderr)
+        return json.loads(child.stdout.strip().splitlines()[-1])
+
+    def test_defaults(self):
+        config = self.load()
+        self.assertEqual(config["workers"], config["cpus"])
+        self.assertEqual(config["worker_class"], "uvicorn.workers.UvicornWorker")
+        self.assertTrue(config["preload_app"])
+        self.assertEqual((config["max_requests"], config["max_requests_jitter"]), (10000, 1000))
+        self.assertEqual(config["graceful_timeout"], 30)
+        # the cores split between the workers
+        self.assertEqual(config["bcrypt_pool_workers"], 1)
+
+    def test_environment_overrides(self):
+        config = self.load(WEB_CONCURRENCY="3", GUNICORN_MAX_REQUESTS="500", BCRYPT_POOL_WORKERS="2")
+        self.assertEqual(config["workers"], 3)
+        self.assertEqual((config["max_requests"], config["max_requests_jitter"]), (500, 50))
+        self.assertEqual(config["bcrypt_pool_workers"], 2)
+
+    def test_sweeper_starts_in_the_worker_not_the_master(self):
+        config = self.load()
+        self.assertNotIn("session-sweeper", config["master_threads"])
+        self.assertIn("session-sweeper", config["worker_threads"])
+
+
+SETTINGS_API_CHILD = r"""
+import asyncio, json, sys
+from Task1.asgi import application
+from django.apps import apps
+from django.core.management import call_command
+from django.urls import resolve
+from api.benchmark import ASGIConnection
+
+call_command("check", fail_level="ERROR")
+
+async def serve():
+    conn = ASGIConnection(application)
+    credentials = json.dumps({"user_name": sys.argv[1], "user_password": sys.argv[2]}).encode()
+    login, body = await conn.request("POST", "/api/login", credentials, auth=False)
+    conn.token = json.loads(body)["data"]["token"]
+    users, _ = await conn.request("GET", "/api/get_users")
+    return login, users
+
+login, users = asyncio.run(serve())
+print(json.dumps({
+    "apps": [config.name for config in apps.get_app_configs()],
+    "contrib_models": sorted(name for name in sys.modules if name.startswith("django.contrib.") and name.endswith(".models")),
+    "view": resolve("/api/get_users").route,
+    "login": login,
+    "users": users,
+}))
+"""
+
+
+class SettingsApiProfileTests(TransactionTestCase):
+    """Task1.settings_api booted in a process of its own, against the test database."""
+
+    def test_boots_and_serves_without_auth_and_contenttypes(self):
+        create_user("apionly")
+        database = connection.settings_dict
+        child = subprocess.run(
+            [sys.executable, "-c", SETTINGS_API_CHILD, "apionly", "secret"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=60,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "Task1.settings_api", "SESSION_SWEEP_INTERVAL_SECONDS": "0",
+                 "DB_NAME": database["NAME"], "DB_USER": database["USER"], "DB_PASSWORD": database["PASSWORD"],
+                 "DB_HOST": database["HOST"], "DB_PORT": str(database["PORT"])},
+        )
+        self.assertEqual(child.returncode, 0, child.stderr)
+        booted = json.loads(child.stdout.strip().splitlines()[-1])
+
+        self.assertEqual(booted["apps"], ["rest_framework", "api", "app1"])
+        self.assertEqual(booted["contrib_models"], [])
+        self.assertEqual(booted["view"], "api/get_users")
+        self.assertEqual((booted["login"], booted["users"]), (200, 200))
+
+
+@override_settings(API_RATE_LIMITS={}, API_RESPONSE_CACHE=False)
+class TokenMemoTests(LoggedInUserMixin, TestCase):
+    """The verified-token memo in app1.tokens, seen through AuthMiddleware."""
+
+    user_name = "memoized"
+
+    def setUp(self):
+        previous, tokens._memo = tokens._memo, None
+        self.addCleanup(setattr, tokens, "_memo", previous)
+        previous, session_store._store = session_store._store, session_store.LocalSessionStore()
+        self.addCleanup(setattr, session_store, "_store", previous)
+
+    def short_lived_token(self):
+        # expires in one to two seconds (exp is whole seconds); the session row stays valid
+        self.expires = int(time.time()) + 2
+        token = jwt.encode(
+            {"user_name": self.user.user_name, "exp": self.expires, "jti": secrets.token_urlsafe(16)},
+            settings.SECRET_KEY, algorithm="HS256",
+        )
+        UserLoginInfo.objects.create(
+            user=self.user, login_session_id=secrets.token_hex(32), token_digest=token_digest(token),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        return token
+
+    def get(self, token):
+        return self.client.get("/api/get_users", HTTP_AUTHORIZATION=token)
+
+    def test_memo_ends_when_the_token_expires(self):
+        token = self.short_lived_token()
+        self.assertEqual(self.get(token).status_code, 200)
+        self.assertIsNotNone(tokens._verified().get(token_digest(token)))
+
+        time.sleep(self.expires - time.time() + 0.05)
+        self.assertIsNone(tokens._verified().get(token_digest(token)))
+        response = self.get(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Token expired"})
+
+    @override_settings(TOKEN_MEMO_TTL_SECONDS=0)
+    def test_memo_lasts_at_most_the_ttl(self):
+        token = self.login()["token"]
+        self.assertEqual(self.get(token).status_code, 200)
+        self.assertIsNone(tokens._verified().get(token_digest(token)))
+
+    def test_invalid_token_is_not_memoized(self):
+        self.assertEqual(self.get("not-a-jwt").status_code, 401)
+        self.assertEqual(len(tokens._verified()), 0)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "replays the migrations in a scratch schema")
+@override_settings(API_RATE_LIMITS={}, API_RESPONSE_CACHE=False)
+class TokenDigestMigrationTests(TestCase):
+    """
+    0007 is irreversible, so instead of migrating the test database back, the
+    app1 migrations are replayed into a schema of their own; SET LOCAL and the
+    schema go away with the test's transaction.
+    """
+
+    before = ("app1", "0006_hot_lookup_indexes")
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE SCHEMA token_digest_smoke")
+            cursor.execute("SET LOCAL search_path TO token_digest_smoke")
+        # a session the store never saw, so the middleware reads the row
+        previous, session_store._store = session_store._store, session_store.LocalSessionStore()
+        self.addCleanup(setattr, session_store, "_store", previous)
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([target])
+        return executor.loader.project_state(target).apps
+
+    def test_token_issued_before_the_migration_still_works(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model("app1", "UserInfo").objects.create(
+            user_name="legacy", user_email="legacy@example.com", user_password="x", user_fullname="Legacy", user_role=3,
+        )
+        token = access_token("legacy")
+        apps.get_model("app1", "UserLoginInfo").objects.create(
+            user=user, login_session_id=secrets.token_hex(32), jwt_token=token,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        # as if the rows had been committed before the deploy
+        connection.check_constraints()
+
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes("app1")[0])
+
+        self.assertTrue(UserLoginInfo.objects.filter(token_digest=token_digest(token)).exists())
+        response = self.client.get("/api/get_users", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+
+
+@unittest.skipIf(fakeredis is None, "needs fakeredis")
+class RedisSessionStoreTests(LoggedInUserMixin, TestCase):
+
+    user_name = "revoker"
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        store = session_store.RedisSessionStore(client_class="fakeredis.FakeRedis")
+        store.client = fakeredis.FakeRedis(server=self.server)
+        previous, session_store._store = session_store._store, store
+        self.addCleanup(setattr, session_store, "_store", previous)
+
+        self.tokens = self.login()
+
+    def test_logout_succeeds_while_redis_is_down(self):
+        self.server.connected = False
+        with self.assertLogs("app1.session_store", "ERROR"):
+            response = self.client.post("/api/logout/revoker", HTTP_AUTHORIZATION=self.tokens["token"])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserLoginInfo.objects.get().is_active)
+
+    def test_refresh_returns_new_tokens_while_redis_is_down(self):
+        self.server.connected = False
+        with self.assertLogs("app1.session_store", "ERROR"):
+            response = self.client.post(
+                "/api/token/refresh", {"refresh_token": self.tokens["refresh_token"]}, content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("refresh_token", response.json()["data"])
+
+    def test_delete_user_succeeds_while_redis_is_down(self):
+        self.server.connected = False
+        with self.assertLogs("app1.session_store", "ERROR"):
+            response = self.client.delete("/api/delete_user/revoker", HTTP_AUTHORIZATION=self.tokens["token"])
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    ADMISSION_CLASSES={"read": {"limit": 1, "max_queue": 1}, "write": {"limit": 1, "max_queue": 1},
+                       "export": {"limit": 1, "max_queue": 1}},
+    ADMISSION_QUEUE_TIMEOUT_SECONDS=0.05,
+)
+class AdmissionControlTests(SimpleTestCase):
+
+    async def slow_app(self, scope, receive, send):
+        await asyncio.sleep(0.2)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def call(self, controller, path="/api/get_users"):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": path, "query_string": b"", "headers": []}
+        await controller(scope, None, send)
+        return sent[0]
+
+    def test_sheds_past_queue_and_deadline(self):
+        controller = AdmissionController(self.slow_app)
+
+        async def burst():
+            return await asyncio.gather(*(self.call(controller) for _ in range(3)))
+
+        # one runs, one waits past the deadline, one finds the queue full
+        starts = asyncio.run(burst())
+        self.assertEqual(sorted(start["status"] for start in starts), [200, 503, 503])
+        busy = next(start for start in starts if start["status"] == 503)
+        self.assertIn((b"retry-after", b"1"), busy["headers"])
+        self.assertEqual(controller.gates["read"].in_flight, 0)
+        self.assertFalse(controller.gates["read"].waiters)
+
+    def test_limit_adapts_to_latency(self):
+        gate = Gate("read", limit=10, max_queue=0, target_p99_ms=100, window=5)
+        for _ in range(5):
+            gate.in_flight += 1
+            gate.release(0.5)
+        self.assertEqual(gate.limit, 9)
+
+        gate.saturated = True
+        for _ in range(5):
+            gate.in_flight += 1
+            gate.release(0.01)
+        self.assertEqual(gate.limit, 10)
@@ -0,0 +1,76 @@
+import secrets
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.utils import timezone
+
+from app1.session_cache import LRUTTLCache, token_digest
+
+_memo = None
+
+
+def _verified():
+    global _memo
+    if _memo is None:
+        _memo = LRUTTLCache(
+            max_entries=settings.TOKEN_MEMO_MAX_ENTRIES,
+            ttl_seconds=settings.TOKEN_MEMO_TTL_SECONDS,
+        )
+    return _memo
+
+
+def bearer(header):
+    """The raw JWT from an Authorization header value (``Bearer `` optional)."""
+    if header.startswith("Bearer "):
+        return header.split(" ")[1]
+    return header
+
+
+def verify(token):
+    """
+    ``(digest, claims)`` for a valid HS256 ``token``; raises
+    jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode.
+
+    Verified tokens are memoized by digest until they expire (at most
+    TOKEN_MEMO_TTL_SECONDS), so repeat requests skip the HMAC check and the
+    JSON parsing. Only valid tokens are memoized, and revocation is still
+    checked against the session store on every request.
+    """
+    digest = token_digest(token)
+    memo = _verified()
+
+    claims = memo.get(digest)
+    if claims is None:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        memo.set(digest, claims, expires_at=claims.get("exp"))
+    return digest, claims
+
+
+def access_token(user_name):
+    """A new short-lived JWT for ``user_name`` (ACCESS_TOKEN_EXPIRY_MINUTES)."""
+    payload = {
+        "user_name": user_name,
+        "exp": timezone.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRY_MINUTES),
+        "jti": secrets.token_urlsafe(16),
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
+
+def refresh_token(login_session_id):
+    """
+    ``(token, digest)``: a new refresh token for the session and the digest
+    stored in its row. The token is ``<login_session_id>.<secret>`` so the
+    row is found through the login_session_id index; only the secret's
+    digest is stored.
+    """
+    secret = secrets.token_urlsafe(32)
+    return f"{login_session_id}.{secret}", token_digest(secret)
+
+
+def split_refresh_token(token):
+    """``(login_session_id, digest)`` of a refresh token, or None if malformed."""
+    session_id, _, secret = token.partition(".")
+    if not session_id or not secret:
+        return None
+    return session_id, token_digest(secret)
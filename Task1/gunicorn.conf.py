@@ -0,0 +1,71 @@
+"""
+Production server: gunicorn managing uvicorn workers, one per available core.
+
+    gunicorn Task1.asgi:application
+
+(gunicorn reads this file from the working directory.) The app is imported
+once in the master and the workers are forked from it, so they share the
+loaded code copy-on-write. Nothing in the master opens a database
+connection, a thread pool or a Redis client: those are created lazily in
+each worker. Every GUNICORN_MAX_REQUESTS requests (plus jitter, so the
+workers do not restart together) a worker is replaced, and on SIGTERM the
+workers finish their requests for up to GUNICORN_GRACEFUL_TIMEOUT seconds.
+
+Connections to Postgres: up to workers x DB_POOL_MAX_SIZE.
+"""
+import math
+import os
+
+
+def available_cpus():
+    """CPUs this container may use: the cgroup quota, else the affinity mask."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                cpus = min(cpus, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+    return max(1, cpus)
+
+
+cpus = available_cpus()
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8001")
+# async workers: one per core keeps every core busy without oversubscribing
+workers = int(os.environ.get("WEB_CONCURRENCY", cpus))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+preload_app = True
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+keepalive = 5
+
+# worker heartbeats in memory rather than on the container's overlay fs
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+# Settings read when the app is preloaded below. Each worker has its own
+# bcrypt pool, so split the cores between them instead of giving every
+# worker one thread per core.
+os.environ.setdefault("BCRYPT_POOL_WORKERS", str(max(1, cpus // workers)))
+
+
+def post_worker_init(worker):
+    # the session sweeper thread, per worker rather than in the master
+    from app1.retention import start_session_sweeper
+
+    start_session_sweeper()